@@ -0,0 +1,104 @@
+from functools import lru_cache
+
+import numpy as np
+
+from landmark_frame import (
+    MOUTH_LEFT, MOUTH_RIGHT,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+    LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP,
+    LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+)
+
+# Output order of compute_angles (same keys as TypeOfExercise buffers)
+ANGLE_CHANNELS = (
+    "left_elbow",
+    "right_elbow",
+    "left_knee",
+    "right_knee",
+    "abdomen",
+    "neck",
+)
+
+# Each angle is a-b-c with b as vertex. Every point is the midpoint of two
+# landmark rows; single joints repeat the row so (p + p) / 2 == p exactly
+# and all channels go through the same gather.
+_A = np.array([
+    [LEFT_SHOULDER, LEFT_SHOULDER],
+    [RIGHT_SHOULDER, RIGHT_SHOULDER],
+    [LEFT_HIP, LEFT_HIP],
+    [RIGHT_HIP, RIGHT_HIP],
+    [RIGHT_SHOULDER, LEFT_SHOULDER],
+    [MOUTH_RIGHT, MOUTH_LEFT],
+])
+_B = np.array([
+    [LEFT_ELBOW, LEFT_ELBOW],
+    [RIGHT_ELBOW, RIGHT_ELBOW],
+    [LEFT_KNEE, LEFT_KNEE],
+    [RIGHT_KNEE, RIGHT_KNEE],
+    [RIGHT_HIP, LEFT_HIP],
+    [RIGHT_SHOULDER, LEFT_SHOULDER],
+])
+_C = np.array([
+    [LEFT_WRIST, LEFT_WRIST],
+    [RIGHT_WRIST, RIGHT_WRIST],
+    [LEFT_ANKLE, LEFT_ANKLE],
+    [RIGHT_ANKLE, RIGHT_ANKLE],
+    [RIGHT_KNEE, LEFT_KNEE],
+    [RIGHT_HIP, LEFT_HIP],
+])
+_NECK = ANGLE_CHANNELS.index("neck")
+
+
+@lru_cache(maxsize=None)
+def _plan(channels):
+    """
+    (rows, first, second, n, neck) for a tuple of channel names (None =
+    all): rows are the landmark rows to read; first/second index into
+    them for the 3n points a..., b..., c... (each the midpoint of two
+    rows); neck holds the output position(s) of the neck channel.
+    """
+    if channels is None:
+        idx = np.arange(len(ANGLE_CHANNELS))
+    else:
+        idx = np.array([ANGLE_CHANNELS.index(name) for name in channels],
+                       dtype=np.intp)
+    pairs = np.concatenate([_A[idx], _B[idx], _C[idx]])
+    rows, local = np.unique(pairs, return_inverse=True)
+    local = local.reshape(pairs.shape)
+    neck = np.flatnonzero(idx == _NECK)
+    return rows, local[:, 0], local[:, 1], len(idx), neck
+
+
+def channel_joints(channels=None):
+    """Sorted landmark indices the given angle channels are computed from."""
+    rows = _plan(None if channels is None else tuple(channels))[0]
+    return rows.tolist()
+
+
+def compute_angles(frames, channels=None):
+    """
+    All tracked angles in one pass.
+    frames: (33, 4) landmark array -> (6,) angles
+            (N, 33, 4) stack       -> (N, 6) angles
+    Columns follow ANGLE_CHANNELS and match the BodyPartAngle methods,
+    including the 360-minus folding and the abs(180 - ...) neck transform.
+    channels (a tuple of ANGLE_CHANNELS names) computes only those, in
+    that order; only the landmark rows they need are read.
+    """
+    rows, first, second, n, neck = _plan(channels)
+    xy = np.asarray(frames)[..., rows, :2].astype(np.float64)
+    points = (xy[..., first, :] + xy[..., second, :]) / 2
+    a = points[..., :n, :]
+    b = points[..., n:2 * n, :]
+    c = points[..., 2 * n:, :]
+
+    cb = c - b
+    ab = a - b
+    radians = np.arctan2(cb[..., 1], cb[..., 0]) - \
+              np.arctan2(ab[..., 1], ab[..., 0])
+    angles = np.abs(radians * 180.0 / np.pi)
+    angles = np.where(angles > 180.0, 360 - angles, angles)
+
+    if len(neck):
+        angles[..., neck] = np.abs(180 - angles[..., neck])
+    return angles
@@ -1,6 +1,5 @@
 
 import streamlit as st
-import cv2
 import os
 import time
 
@@ -74,10 +73,20 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Your Streamlit app code continues here...
-from engine import start_engine
+from background_session import BackgroundSession
+from live_view import LiveView, serve_live_view, LIVE_VIEW_PORT
 
 VIDEO_DIR = "Exercise Videos"
 
+
+@st.cache_resource
+def get_live_view():
+    # one encoder + HTTP server per process, shared across reruns
+    view = LiveView(color_order="rgb").start()
+    serve_live_view(view, port=LIVE_VIEW_PORT)
+    return view
+
+
 def main():
     st.set_page_config(
         page_title="PostuRight – AI Trainer",
@@ -93,6 +102,10 @@ def main():
     if "countdown_done" not in st.session_state:
         st.session_state.countdown_done = False
 
+    # analysis running on its own thread; survives reruns
+    if "session" not in st.session_state:
+        st.session_state.session = None
+
     # Sidebar
     st.sidebar.image("Brand_Logo.jpg", use_container_width=True)
     st.sidebar.header("Settings")
@@ -121,12 +134,33 @@ def main():
             else:
                 video_path = video_name
 
+    # Frames for tablets etc. go out as rate-limited JPEG (MJPEG) instead
+    # of through the Streamlit page
+    live_view = st.sidebar.checkbox("Live view on other devices")
+    if live_view:
+        view = get_live_view()
+        view.quality = st.sidebar.slider("JPEG quality", 30, 95, 70)
+        view.max_width = st.sidebar.select_slider(
+            "Max width", [320, 480, 640, 800], value=640)
+        view.max_fps = st.sidebar.slider("Max FPS", 5, 30, 15)
+        st.sidebar.markdown(
+            f"Open **http://&lt;this machine&gt;:{LIVE_VIEW_PORT}/**")
+
+    # Analysis runs at full rate regardless; this is only how often the
+    # page repaints from the latest result
+    refresh_hz = st.sidebar.slider("Display refresh (Hz)", 5, 30, 12)
+
     if st.sidebar.button("Start / Restart"):
+        if st.session_state.session is not None:
+            st.session_state.session.stop()
+            st.session_state.session = None
         st.session_state.run = True
         st.session_state.countdown_done = False
 
     if st.sidebar.button("Stop"):
         st.session_state.run = False
+        if st.session_state.session is not None:
+            st.session_state.session.stop()
 
     col1, col2, col3, col4 = st.columns(4)
 
@@ -198,30 +232,58 @@ def main():
             placeholder.empty()
 
         # ----------------- STREAMING ----------------
-        def display_callback(frame, reps, stage, posture, progress, fps):
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-            stframe.image(frame_rgb, channels="RGB", use_container_width=True)
-
-            kpi_reps.metric("Reps", reps)
-            kpi_stage.metric("Stage", stage)
-            kpi_posture.metric("Posture", "Good" if posture else "Bad")
-            kpi_fps.metric("FPS", fps)
-
-        def stop_callback():
-            return st.session_state.run
+        # Runs on the session's worker thread, once per analyzed frame
+        def publish_live(frame, reps, stage, posture, progress, fps):
+            view.publish_frame(frame)
+            view.publish_kpis(reps=reps, stage=stage, posture=posture,
+                              progress=round(progress, 2), fps=fps)
+
+        session = st.session_state.session
+        if session is None:
+            session = BackgroundSession(
+                exercise,
+                video_source,
+                on_frame=publish_live if live_view else None,
+                color_order="rgb"
+            ).start()
+            st.session_state.session = session
+
+        # Repaint from the latest result at refresh_hz. Every tick touches
+        # the page, so a Stop click interrupts this loop within one period
+        # (and the rerun stops the worker); a rerun for any other reason
+        # just picks the running session up again.
+        period = 1.0 / refresh_hz
+        seq = 0
+        kpis = None
+        while not session.done:
+            tick = time.time()
+            seq, frame, latest = session.latest(seq, timeout=period)
+            if latest is not None:
+                kpis = latest
+                if frame is not None and not live_view:
+                    stframe.image(frame, channels="RGB",
+                                  use_container_width=True)
+
+            if kpis is not None:
+                kpi_reps.metric("Reps", kpis["reps"])
+                kpi_stage.metric("Stage", kpis["stage"])
+                kpi_posture.metric("Posture",
+                                   "Good" if kpis["posture"] else "Bad")
+                kpi_fps.metric("FPS", kpis["fps"])
+            else:
+                kpi_fps.metric("FPS", 0)
 
-        report = start_engine(
-            exercise,
-            video_source,
-            display_callback,
-            stop_callback
-        )
+            time.sleep(max(0.0, period - (time.time() - tick)))
 
-        st.session_state.last_report = report
+        st.session_state.session = None
         st.session_state.run = False
         st.session_state.countdown_done = False
 
+        if session.error is not None:
+            st.error(f"Analysis failed: {session.error}")
+        else:
+            st.session_state.last_report = session.report
+
     # ---------------------------------------
     # SHOW LAST REPORT
     # ---------------------------------------
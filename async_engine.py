@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import numpy as np
+import mediapipe as mp
+
+from engine import (
+    _Analyzer, open_capture, frame_reader, render_result, write_report,
+    POSE_CONFIG,
+)
+from media_clock import source_clock
+
+mp_pose = mp.solutions.pose
+
+
+class AsyncSession:
+    """
+    One analysis session as an async iterator of engine.FrameResult:
+
+        async with AsyncSession("squat", 0) as session:
+            async for r in session:
+                await ws.send_json({"reps": r.reps, "stage": r.stage})
+        report = session.result
+
+    Capture, inference and drawing run on `executor` (None = the loop's
+    default thread pool, shared by every session on the loop), so the
+    event loop itself never blocks. Reading the next frame overlaps with
+    inference of the current one.
+
+    Stopping: call stop(), or break out of the loop / cancel the task
+    inside the `async with` (or call aclose()). The capture and Pose
+    graph are released either way, and the report (start_engine's
+    result dict) is written and kept in .result.
+
+    With render=True result.frame is the drawn frame in color_order; the
+    buffer is reused, so copy it to keep it past the next iteration.
+    With timings=True result.timings has the "infer" and "render"
+    seconds of the frame (None otherwise).
+    """
+
+    def __init__(self, exercise_type, video_source, render=False,
+                 color_order="bgr", executor=None, report_label=None,
+                 timings=False):
+        self.exercise_type = exercise_type
+        self.video_source = video_source
+        self.render = render
+        self.color_order = color_order
+        self.executor = executor
+        self.report_label = report_label
+        self.timings = timings
+        self.result = None
+        self._stopped = False
+        self._gen = None
+
+    def stop(self):
+        """Ends iteration after the current frame."""
+        self._stopped = True
+
+    def __aiter__(self):
+        if self._gen is None:
+            self._gen = self._frames()
+        return self._gen
+
+    async def aclose(self):
+        """Releases the session now (a plain break defers it to GC)."""
+        if self._gen is not None:
+            await self._gen.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def _frames(self):
+        cap = await self._run(open_capture, self.video_source)
+        pose = await self._run(lambda: mp_pose.Pose(**POSE_CONFIG))
+        # frames in flight: the one being inferred, the one being read,
+        # and the one handed to the caller
+        reader = frame_reader(cap, 3, source_clock(self.video_source, cap))
+        analyzer = _Analyzer(self.exercise_type, pose)
+        out = np.empty(reader.pool.shape, np.uint8) if self.render else None
+
+        reading = asyncio.ensure_future(self._run(reader.read))
+        working = None  # the feed / flush / draw job in flight
+        try:
+            while not self._stopped:
+                rgb, timestamp = await asyncio.shield(reading)
+                reading = None
+                infer = 0.0
+                if rgb is None:
+                    working = asyncio.ensure_future(self._run(analyzer.flush))
+                    ready = await asyncio.shield(working)
+                else:
+                    reading = asyncio.ensure_future(self._run(reader.read))
+                    start = time.perf_counter()
+                    working = asyncio.ensure_future(
+                        self._run(analyzer.feed, rgb, timestamp))
+                    ready = await asyncio.shield(working)
+                    infer = time.perf_counter() - start
+                working = None
+
+                for i, (held, result) in enumerate(ready):
+                    # held-back frames come first; the inferred one is last
+                    last = i == len(ready) - 1
+                    render = 0.0
+                    if self.render:
+                        start = time.perf_counter()
+                        working = asyncio.ensure_future(
+                            self._run(self._draw, held, result, out))
+                        result.frame = await asyncio.shield(working)
+                        working = None
+                        render = time.perf_counter() - start
+                    reader.pool.release(held)
+                    if self.timings:
+                        result.timings = {"infer": infer if last else 0.0,
+                                          "render": render}
+                    yield result
+
+                if rgb is None:
+                    break
+        finally:
+            # executor jobs cannot be interrupted (they are awaited
+            # shielded, so a cancelled caller leaves them running): let
+            # the pending read and inference / drawing finish before
+            # Pose and the capture go away
+            pending = [job for job in (reading, working) if job is not None]
+            if pending:
+                await asyncio.wait(pending)
+            await self._run(self._close, cap, pose, analyzer)
+
+    def _draw(self, rgb, result, out):
+        return render_result(rgb, result, self.exercise_type, out=out,
+                             color_order=self.color_order)
+
+    def _close(self, cap, pose, analyzer):
+        cap.release()
+        analyzer.close()
+        pose.close()
+        self.result = write_report(self.exercise_type, analyzer.counter,
+                                   int(analyzer.duration),
+                                   analyzer.good_frames, analyzer.bad_frames,
+                                   label=self.report_label)
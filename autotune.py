@@ -0,0 +1,90 @@
+# (model_complexity, inference scale relative to FRAME_SIZE), heaviest
+# first. Scaling keeps the aspect ratio, so normalized landmarks (and every
+# angle computed from them) stay in the same coordinate space.
+LEVELS = [
+    (1, 1.0),    # 800x480, full model (the engine's default)
+    (1, 0.8),    # 640x384
+    (0, 0.8),    # 640x384, lite model
+    (0, 0.6),    # 480x288
+    (0, 0.4),    # 320x192
+]
+HEAVY_LEVEL = (2, 1.0)
+
+
+class LatencyAutotuner:
+    """
+    Picks model complexity and inference resolution to meet target_fps.
+
+    Inference latency is tracked as an EMA. After `settle` frames at a
+    level (the first frames of a new graph are slow, so they are not
+    judged), it steps to a lighter level while over budget, and back to a
+    heavier one when latency is under `headroom` x budget. A level that
+    was too slow is not retried for `cooldown` frames, so it does not
+    oscillate on a machine that sits right at the edge.
+    """
+
+    def __init__(self, target_fps=15.0, levels=None, start=0, alpha=0.1,
+                 headroom=0.6, settle=15, cooldown=300, allow_heavy=False):
+        self.levels = list(levels or LEVELS)
+        if allow_heavy:
+            self.levels.insert(0, HEAVY_LEVEL)
+            start += 1
+        self.budget = 1.0 / target_fps
+        self.index = start
+        self.alpha = alpha
+        self.headroom = headroom
+        self.settle = settle
+        self.cooldown = cooldown
+
+        self.ema = None
+        self._frames = 0
+        self._frame = 0
+        self._blocked_until = {}
+
+    @property
+    def model_complexity(self):
+        return self.levels[self.index][0]
+
+    @property
+    def scale(self):
+        return self.levels[self.index][1]
+
+    def record(self, seconds):
+        """Feeds one inference latency; returns True if the level changed."""
+        self._frame += 1
+        self._frames += 1
+        if self._frames <= self.settle // 3:
+            return False  # graph warm-up, not representative
+        if self.ema is None:
+            self.ema = seconds
+        else:
+            self.ema += self.alpha * (seconds - self.ema)
+        if self._frames < self.settle:
+            return False
+
+        if self.ema > self.budget and self.index < len(self.levels) - 1:
+            self._blocked_until[self.index] = self._frame + self.cooldown
+            return self._move(+1)
+
+        heavier = self.index - 1
+        if (heavier >= 0 and self.ema < self.budget * self.headroom
+                and self._blocked_until.get(heavier, 0) <= self._frame):
+            return self._move(-1)
+
+        return False
+
+    def drop_complexity(self, model_complexity):
+        """Removes levels whose model is unavailable (e.g. not downloadable)."""
+        current = self.levels[self.index]
+        self.levels = [lv for lv in self.levels if lv[0] != model_complexity]
+        # stay as close as possible to the requested load
+        self.index = min(range(len(self.levels)),
+                         key=lambda i: abs(self.levels[i][1] - current[1]))
+        self.ema = None
+        self._frames = 0
+
+    def _move(self, step):
+        self.index += step
+        self.ema = None
+        self._frames = 0
+        return True
@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+
+from engine import start_engine
+
+
+class BackgroundSession:
+    """
+    start_engine on a worker thread, for UIs that repaint at their own
+    rate (e.g. the Streamlit app at 10-15 Hz).
+
+    The engine's display_callback only copies the newest frame and KPIs
+    into a slot and returns, so analysis runs at full rate and every
+    frame is counted, however slow the UI is. The UI polls latest() and
+    simply skips the frames it had no time for. stop() is seen by the
+    engine before its next frame.
+
+    Extra keyword arguments go to start_engine; on_frame, if given, is
+    called on the worker thread with start_engine's display_callback
+    arguments (e.g. to feed a live_view.LiveView).
+    """
+
+    def __init__(self, exercise_type, video_source, on_frame=None,
+                 **engine_kwargs):
+        self.exercise_type = exercise_type
+        self.video_source = video_source
+        self.on_frame = on_frame
+        self.engine_kwargs = engine_kwargs
+
+        self.report = None
+        self.error = None
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._frame = None   # written by the engine
+        self._shown = None   # handed to the UI
+        self._kpis = None
+        self._seq = 0
+        self._thread = None
+        self._finished = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def done(self):
+        """The engine has returned (or failed); report / error are set."""
+        return self._finished
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def latest(self, last_seq=0, timeout=None):
+        """
+        (seq, frame, kpis) for the newest analyzed frame once it is newer
+        than last_seq (waits up to timeout); frame is None when headless,
+        kpis a dict of reps / stage / posture / progress / fps. Returns
+        (last_seq, None, None) if nothing new came in time. The frame is
+        the session's own copy; it stays valid until the next call.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._seq != last_seq or self.done or self.stopped,
+                timeout)
+            if self._seq == last_seq:
+                return last_seq, None, None
+            frame = None
+            if self._frame is not None:
+                shown = self._shown
+                if shown is None or shown.shape != self._frame.shape:
+                    self._shown = np.empty_like(self._frame)
+                np.copyto(self._shown, self._frame)
+                frame = self._shown
+            return self._seq, frame, dict(self._kpis)
+
+    def _display(self, frame, reps, stage, posture, progress, fps):
+        with self._cond:
+            if frame is not None:
+                if self._frame is None or self._frame.shape != frame.shape:
+                    self._frame = np.empty_like(frame)
+                np.copyto(self._frame, frame)
+            self._kpis = {"reps": reps, "stage": stage, "posture": posture,
+                          "progress": progress, "fps": fps}
+            self._seq += 1
+            self._cond.notify_all()
+
+        if self.on_frame is not None:
+            self.on_frame(frame, reps, stage, posture, progress, fps)
+
+    def _run(self):
+        try:
+            self.report = start_engine(
+                self.exercise_type, self.video_source,
+                display_callback=self._display,
+                stop_callback=lambda: not self._stop.is_set(),
+                **self.engine_kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
@@ -0,0 +1,112 @@
+import csv
+import glob
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from engine import start_engine, REPORT_DIR
+
+EXERCISES = ["squat", "push-up", "pull-up", "sit-up"]
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+
+# Filename keyword -> exercise type (checked in order)
+EXERCISE_KEYWORDS = [
+    ("squat", "squat"),
+    ("push", "push-up"),
+    ("pull", "pull-up"),
+    ("sit", "sit-up"),
+]
+
+
+def infer_exercise(video_path):
+    """Guesses the exercise from the file name, e.g. squat_7.mp4 -> squat."""
+    name = os.path.basename(video_path).lower()
+    for keyword, exercise in EXERCISE_KEYWORDS:
+        if keyword in name:
+            return exercise
+    return None
+
+
+def collect_videos(pattern):
+    """A directory (all video files inside) or a glob pattern."""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, f) for f in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+
+    return sorted(p for p in paths
+                  if os.path.isfile(p) and p.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def _analyze_one(video_path, exercise_type):
+    """Worker: one headless start_engine run; errors are reported, not raised."""
+    label = os.path.splitext(os.path.basename(video_path))[0]
+    try:
+        result = start_engine(exercise_type, video_path, report_label=label,
+                              headless=True)
+        # per-frame arrays are not needed for the summary
+        result.pop("timeline", None)
+        result["error"] = ""
+    except Exception as e:
+        result = {"exercise": exercise_type, "reps": None, "duration": None,
+                  "accuracy": None, "report_path": None, "error": repr(e)}
+    result["video"] = video_path
+    return result
+
+
+def run_batch(pattern, exercise_type=None, workers=None):
+    """
+    Analyzes every video matched by pattern across a process pool.
+    exercise_type forces one exercise for all files; otherwise it is
+    inferred per file name (files that match nothing are skipped).
+    Writes the usual per-video reports plus a combined summary CSV.
+    Returns (results, summary_path).
+    """
+    jobs = []
+    skipped = []
+    for path in collect_videos(pattern):
+        exercise = exercise_type or infer_exercise(path)
+        if exercise is None:
+            skipped.append(path)
+        else:
+            jobs.append((path, exercise))
+
+    workers = workers or multiprocessing.cpu_count()
+    results = []
+
+    if jobs:
+        # spawn: MediaPipe graphs are not fork-safe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=ctx) as pool:
+            futures = [pool.submit(_analyze_one, path, exercise)
+                       for path, exercise in jobs]
+            results = [f.result() for f in futures]
+
+    for path in skipped:
+        results.append({"video": path, "exercise": None, "reps": None,
+                        "duration": None, "accuracy": None,
+                        "report_path": None,
+                        "error": "could not infer exercise type"})
+
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    summary_path = os.path.join(REPORT_DIR, f"batch_summary_{timestamp}.csv")
+
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Video", "Exercise", "Reps", "Duration(s)",
+                         "Accuracy(%)", "Report", "Error"])
+        for r in results:
+            accuracy = r["accuracy"]
+            writer.writerow([
+                r["video"],
+                r["exercise"],
+                r["reps"],
+                r["duration"],
+                round(accuracy, 2) if accuracy is not None else None,
+                r["report_path"],
+                r["error"]
+            ])
+
+    return results, summary_path
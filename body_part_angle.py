@@ -3,69 +3,74 @@ import pandas as pd
 import numpy as np
 import cv2
 from utils import *
+from angle_kernel import compute_angles
+from landmark_frame import (
+    LandmarkFrame, MOUTH_LEFT, MOUTH_RIGHT,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+    LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP,
+    LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+)
 
 
 class BodyPartAngle:
     def __init__(self, landmarks):
         self.landmarks = landmarks
 
+    @property
+    def landmarks(self):
+        return self._frame
+
+    @landmarks.setter
+    def landmarks(self, landmarks):
+        # convert once per frame; every angle below indexes the same array
+        if landmarks is None:
+            self._frame = None
+            self._xy = None
+        else:
+            self._frame = LandmarkFrame.from_mediapipe(landmarks)
+            self._xy = self._frame.xy()
+
+    def _mid(self, right, left):
+        p = self._xy
+        return (p[right] + p[left]) / 2
+
     def angle_of_the_left_arm(self):
-        l_shoulder = detection_body_part(self.landmarks, "LEFT_SHOULDER")
-        l_elbow = detection_body_part(self.landmarks, "LEFT_ELBOW")
-        l_wrist = detection_body_part(self.landmarks, "LEFT_WRIST")
-        return calculate_angle(l_shoulder, l_elbow, l_wrist)
-    
+        p = self._xy
+        return calculate_angle(p[LEFT_SHOULDER], p[LEFT_ELBOW], p[LEFT_WRIST])
+
     def angle_of_the_right_arm(self):
-        r_shoulder = detection_body_part(self.landmarks, "RIGHT_SHOULDER")
-        r_elbow = detection_body_part(self.landmarks, "RIGHT_ELBOW")
-        r_wrist = detection_body_part(self.landmarks, "RIGHT_WRIST")
-        return calculate_angle(r_shoulder, r_elbow, r_wrist)
+        p = self._xy
+        return calculate_angle(p[RIGHT_SHOULDER], p[RIGHT_ELBOW], p[RIGHT_WRIST])
+
 
-    
 
     def angle_of_the_left_leg(self):
-        l_hip = detection_body_part(self.landmarks, "LEFT_HIP")
-        l_knee = detection_body_part(self.landmarks, "LEFT_KNEE")
-        l_ankle = detection_body_part(self.landmarks, "LEFT_ANKLE")
-        return calculate_angle(l_hip, l_knee, l_ankle)
+        p = self._xy
+        return calculate_angle(p[LEFT_HIP], p[LEFT_KNEE], p[LEFT_ANKLE])
 
     def angle_of_the_right_leg(self):
-        r_hip = detection_body_part(self.landmarks, "RIGHT_HIP")
-        r_knee = detection_body_part(self.landmarks, "RIGHT_KNEE")
-        r_ankle = detection_body_part(self.landmarks, "RIGHT_ANKLE")
-        return calculate_angle(r_hip, r_knee, r_ankle)
+        p = self._xy
+        return calculate_angle(p[RIGHT_HIP], p[RIGHT_KNEE], p[RIGHT_ANKLE])
 
     def angle_of_the_neck(self):
-        r_shoulder = detection_body_part(self.landmarks, "RIGHT_SHOULDER")
-        l_shoulder = detection_body_part(self.landmarks, "LEFT_SHOULDER")
-        r_mouth = detection_body_part(self.landmarks, "MOUTH_RIGHT")
-        l_mouth = detection_body_part(self.landmarks, "MOUTH_LEFT")
-        r_hip = detection_body_part(self.landmarks, "RIGHT_HIP")
-        l_hip = detection_body_part(self.landmarks, "LEFT_HIP")
-
-        shoulder_avg = [(r_shoulder[0] + l_shoulder[0]) / 2,
-                        (r_shoulder[1] + l_shoulder[1]) / 2]
-        mouth_avg = [(r_mouth[0] + l_mouth[0]) / 2,
-                     (r_mouth[1] + l_mouth[1]) / 2]
-        hip_avg = [(r_hip[0] + l_hip[0]) / 2, (r_hip[1] + l_hip[1]) / 2]
+        shoulder_avg = self._mid(RIGHT_SHOULDER, LEFT_SHOULDER)
+        mouth_avg = self._mid(MOUTH_RIGHT, MOUTH_LEFT)
+        hip_avg = self._mid(RIGHT_HIP, LEFT_HIP)
 
         return abs(180 - calculate_angle(mouth_avg, shoulder_avg, hip_avg))
 
     def angle_of_the_abdomen(self):
         # calculate angle of the avg shoulder
-        r_shoulder = detection_body_part(self.landmarks, "RIGHT_SHOULDER")
-        l_shoulder = detection_body_part(self.landmarks, "LEFT_SHOULDER")
-        shoulder_avg = [(r_shoulder[0] + l_shoulder[0]) / 2,
-                        (r_shoulder[1] + l_shoulder[1]) / 2]
+        shoulder_avg = self._mid(RIGHT_SHOULDER, LEFT_SHOULDER)
 
         # calculate angle of the avg hip
-        r_hip = detection_body_part(self.landmarks, "RIGHT_HIP")
-        l_hip = detection_body_part(self.landmarks, "LEFT_HIP")
-        hip_avg = [(r_hip[0] + l_hip[0]) / 2, (r_hip[1] + l_hip[1]) / 2]
+        hip_avg = self._mid(RIGHT_HIP, LEFT_HIP)
 
         # calculate angle of the avg knee
-        r_knee = detection_body_part(self.landmarks, "RIGHT_KNEE")
-        l_knee = detection_body_part(self.landmarks, "LEFT_KNEE")
-        knee_avg = [(r_knee[0] + l_knee[0]) / 2, (r_knee[1] + l_knee[1]) / 2]
+        knee_avg = self._mid(RIGHT_KNEE, LEFT_KNEE)
 
         return calculate_angle(shoulder_avg, hip_avg, knee_avg)
+
+    def angles_of_all_parts(self):
+        # one vectorized call, ordered as angle_kernel.ANGLE_CHANNELS
+        return compute_angles(self._frame.data)
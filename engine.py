@@ -2,11 +2,28 @@ import cv2
 import time
 import os
 import csv
+import queue
+import threading
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
+import numpy as np
 import mediapipe as mp
+from mediapipe.framework.formats import landmark_pb2
 
-from types_of_exercise import TypeOfExercise
-from utils import score_table
+from types_of_exercise import TypeOfExercise, EXERCISE_DEFINITIONS
+from rep_machine import STAGE_NAMES
+from utils import score_table, stack_landmark_frames
+from landmark_frame import LandmarkFrame
+from landmark_cache import LandmarkCache, cache_key
+from landmark_archive import LandmarkArchiveWriter, write_archive
+from keyframes import KeyframeScheduler
+from roi import RoiTracker, to_full_frame
+from autotune import LatencyAutotuner
+from frame_pool import FramePool, FrameReader
+from ffmpeg_capture import FFmpegCapture, FFmpegReader
+from media_clock import FrameTime, source_clock
+from seek_index import load_index, plan_segments
 
 
 mp_drawing = mp.solutions.drawing_utils
@@ -15,125 +32,896 @@ mp_pose = mp.solutions.pose
 REPORT_DIR = "reports"
 os.makedirs(REPORT_DIR, exist_ok=True)
 
+FRAME_SIZE = (800, 480)
+
+# Capture backends for open_capture / start_engine(decoder=...)
+DECODERS = ("opencv", "ffmpeg")
+
+# Everything besides the video itself that changes the landmarks we get
+POSE_CONFIG = {
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+    "model_complexity": 1,
+}
+
+# End-of-stream marker passed between pipeline stages
+_DONE = object()
+
+# Debug text label of each angle channel an exercise counts on
+ANGLE_LABELS = {
+    "left_elbow": "Elbow L",
+    "right_elbow": "Elbow R",
+    "left_knee": "Knee L",
+    "right_knee": "Knee R",
+    "abdomen": "Torso",
+    "neck": "Neck",
+}
+
 
 def fmt_ang(a):
     return f"{int(a)}°" if a is not None else "N/A"
 
 
+# -------------------------
+# Pipeline stages
+# -------------------------
+def open_capture(video_source, decoder="opencv", decode_fps=None):
+    """
+    decoder="ffmpeg" decodes in an ffmpeg subprocess that also scales to
+    FRAME_SIZE, converts to RGB and, with decode_fps, drops frames down
+    to that rate (see ffmpeg_capture).
+    """
+    if decoder not in DECODERS:
+        raise ValueError(f"unknown decoder: {decoder}")
+    if decoder == "ffmpeg":
+        return FFmpegCapture(video_source, FRAME_SIZE, fps=decode_fps)
+
+    cap = cv2.VideoCapture(video_source)
+    cap.set(3, 800)
+    cap.set(4, 480)
+    return cap
+
+
+def frame_reader(cap, count=4, clock=None):
+    """FrameReader for cap, yielding pooled FRAME_SIZE RGB frames."""
+    pool = FramePool((FRAME_SIZE[1], FRAME_SIZE[0], 3), count)
+    if isinstance(cap, FFmpegCapture):
+        return FFmpegReader(cap, pool, clock)
+    return FrameReader(cap, FRAME_SIZE, pool, clock)
+
+
+def to_pose_landmarks(landmarks):
+    """LandmarkFrame -> NormalizedLandmarkList, for mp_drawing."""
+    if landmarks is None:
+        return None
+    proto = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in landmarks.data.tolist():
+        proto.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return proto
+
+
+def _close_later(pose):
+    # tearing a graph down blocks for ~0.2 s; keep it off the hot path
+    threading.Thread(target=pose.close, daemon=True).start()
+
+
+def _cached_frame(data):
+    # NaN rows mark frames where no pose was detected
+    return None if np.isnan(data[0, 0]) else LandmarkFrame(data)
+
+
+@dataclass(slots=True)
+class FrameResult:
+    """
+    What the engine knows about one frame, in frame order.
+    landmarks is the (33, 4) float32 array (None = no pose), angles the
+    smoothed angle channels (shared with the tracker: read-only),
+    timings seconds per stage ("decode", "infer", "render") when
+    requested, frame the drawn image when one was requested.
+    pose_landmarks is the same pose as a MediaPipe proto, for drawing.
+    """
+    index: int
+    timestamp: float
+    landmarks: object
+    angles: dict
+    reps: int
+    stage: object
+    posture: bool
+    progress: float
+    timings: dict = None
+    frame: object = None
+    pose_landmarks: object = field(default=None, repr=False)
+
+
+def render_result(rgb, result, exercise_type, **kwargs):
+    """render_frame for a FrameResult (kwargs: out, color_order, joints)."""
+    return render_frame(rgb, result.pose_landmarks, exercise_type,
+                        result.reps, result.stage, result.posture,
+                        result.angles, **kwargs)
+
+
+class _Timeline:
+    """Per-frame tracker output of a headless run, as compact arrays."""
+
+    def __init__(self):
+        self.reps = []
+        self.stage = []
+        self.posture = []
+        self.progress = []
+
+    def append(self, counter, stage, posture, progress):
+        self.reps.append(counter)
+        self.stage.append(stage)
+        self.posture.append(posture)
+        self.progress.append(progress)
+
+    def to_dict(self):
+        return {
+            "reps": np.array(self.reps, dtype=np.int32),
+            "stage": np.array(self.stage, dtype=object),
+            "posture": np.array(self.posture, dtype=bool),
+            "progress": np.array(self.progress, dtype=np.float32),
+        }
+
+
+class _Analyzer:
+    """
+    Pose inference + rep tracking. Holds all per-session state,
+    so frames must be fed strictly in order.
+
+    Time is media time: each frame's timestamp (video position for
+    files, capture time for live sources) drives the tracker's clock,
+    so results do not depend on how fast frames are processed.
+    """
+
+    def __init__(self, exercise_type, pose, record_landmarks=False,
+                 cached=None, archive=None, timeline=False,
+                 scheduler=None, roi=None, autotuner=None):
+        self.exercise_type = exercise_type
+        self.pose = pose
+        # (N, 33, 4) landmarks from the cache replace pose inference
+        self.cached = cached
+        # optional KeyframeScheduler; inference only on its keyframes
+        self.scheduler = scheduler
+        # optional RoiTracker; inference on a crop around the last pose,
+        # with its own graph that is restarted whenever the box moves
+        self.roi = roi
+        self._roi_pose = None
+        self._roi_box = None
+        # optional LatencyAutotuner; may swap the graph and input scale
+        self.autotuner = autotuner
+        self.pose_config = dict(POSE_CONFIG)
+        self.infer_scale = 1.0
+        self._scaled = None
+        self._tuned_pose = None
+        if autotuner is not None:
+            self._apply_level()
+        self.frame_index = 0
+        self.tracked = 0
+        self.clock = FrameTime()
+        # timestamps of frames fed but not tracked yet, in order
+        self._times = deque()
+        # only the angles this exercise needs are computed
+        self.tracker = TypeOfExercise(None, clock=self.clock,
+                                      exercises=(exercise_type,))
+        # the exercise's row in the tracker's state machine (None for an
+        # unknown exercise, which never counts)
+        self._definition = self.tracker.machine.index.get(
+            exercise_type.lower())
+        self.counter = 0
+        self.stage = None
+        self.posture = False
+        self.progress = 0.0
+        self.good_frames = 0
+        self.bad_frames = 0
+        self.recorded = [] if record_landmarks else None
+        # optional LandmarkArchiveWriter, timestamps relative to the start
+        self.archive = archive
+        self.start_time = None
+        self.last_time = self._prev_time = None
+        # archive times stay relative to the first tracked frame
+        self.origin = None
+        # duration of the segments before the current one
+        self._elapsed = 0.0
+        self.timeline = _Timeline() if timeline else None
+
+    @property
+    def duration(self):
+        """Seconds of media tracked, counting the last frame's interval."""
+        if self.start_time is None:
+            return round(self._elapsed, 3)
+        span = self.last_time - self.start_time
+        return round(self._elapsed + span + self.last_time - self._prev_time,
+                     3)
+
+    def begin_segment(self, frame_index):
+        """
+        The next frame fed is video frame frame_index, after a seek:
+        the time since the last one is not counted in duration.
+        """
+        self._elapsed = self.duration
+        self.start_time = None
+        self.frame_index = frame_index
+
+    def warm(self, rgb, timestamp):
+        """
+        Warm-up frame before a segment: inferred (so MediaPipe's tracking
+        settles) and run through smoothing and the stage logic, but not
+        counted, emitted, recorded or scored.
+        """
+        _, landmarks = self._infer(rgb)
+        self.frame_index += 1
+        if self.scheduler is not None:
+            self.scheduler.anchor(rgb, landmarks)
+        self.clock.now = timestamp
+        self.warm_track(landmarks)
+
+    def warm_track(self, landmarks):
+        """
+        Tracker step that settles smoothing and stage, counts nothing:
+        a rep completed here neither counts nor restarts the minimum
+        rep interval for the segment's first real rep.
+        """
+        if landmarks is not None:
+            self.tracker.update_landmarks(landmarks)
+        i = self._definition
+        if i is not None:
+            self.tracker.step_exercise(i, count=False)
+            self.stage = STAGE_NAMES[int(self.tracker.machine.stage[i])]
+
+    def feed(self, rgb, timestamp=None):
+        """
+        Takes the next decoded frame and its timestamp (None keeps the
+        clock where it is); returns the (rgb, FrameResult) pairs that
+        are ready, in frame order. Without a scheduler that is always just
+        this frame; with one, skipped frames are released (interpolated)
+        when the next keyframe has been inferred.
+        """
+        self._times.append(timestamp)
+        scheduler = self.scheduler
+        if scheduler is not None and not scheduler.is_keyframe(rgb, self):
+            scheduler.defer(rgb)
+            self.frame_index += 1
+            return []
+
+        pose_landmarks, landmarks = self._infer(rgb)
+        self.frame_index += 1
+
+        ready = []
+        if scheduler is not None:
+            for held_rgb, held in scheduler.resolve(landmarks):
+                ready.append((held_rgb,
+                              self._step(held, to_pose_landmarks(held))))
+        ready.append((rgb, self._step(landmarks, pose_landmarks)))
+        return ready
+
+    def flush(self):
+        """End of stream: releases frames still held by the scheduler."""
+        if self.scheduler is None:
+            return []
+        return [(rgb, self._step(held, to_pose_landmarks(held)))
+                for rgb, held in self.scheduler.drain()]
+
+    def _infer(self, rgb):
+        if self.cached is not None:
+            landmarks = None
+            if self.frame_index < len(self.cached):
+                landmarks = _cached_frame(self.cached[self.frame_index])
+            return to_pose_landmarks(landmarks), landmarks
+
+        if self.roi is not None:
+            return self._infer_roi(rgb)
+
+        pose_landmarks = self._run_pose(rgb)
+        landmarks = None
+        if pose_landmarks:
+            landmarks = LandmarkFrame.from_mediapipe(pose_landmarks)
+        return pose_landmarks, landmarks
+
+    def _run_pose(self, rgb, pose=None):
+        start = time.perf_counter()
+        if self.infer_scale != 1.0:
+            # landmarks are normalized, so a smaller input maps back as-is
+            h, w = rgb.shape[:2]
+            size = (round(w * self.infer_scale), round(h * self.infer_scale))
+            scaled = self._scaled
+            if scaled is None or scaled.shape[:2] != (size[1], size[0]):
+                scaled = None
+            rgb = self._scaled = cv2.resize(rgb, size, dst=scaled,
+                                            interpolation=cv2.INTER_AREA)
+
+        rgb.flags.writeable = False
+        results = (pose or self.pose).process(rgb)
+        rgb.flags.writeable = True
+
+        if self.autotuner is not None:
+            if self.autotuner.record(time.perf_counter() - start):
+                self._apply_level()
+        return results.pose_landmarks
+
+    def _apply_level(self):
+        tuner = self.autotuner
+        self.infer_scale = tuner.scale
+        if tuner.model_complexity == self.pose_config["model_complexity"]:
+            return
+
+        config = dict(POSE_CONFIG, model_complexity=tuner.model_complexity)
+        try:
+            pose = mp_pose.Pose(**config)
+        except Exception:
+            # lite / heavy models are downloaded on first use; if that
+            # fails, tune with the models we have
+            tuner.drop_complexity(config["model_complexity"])
+            self._apply_level()
+            return
+
+        self.pose_config = config
+        old = self._tuned_pose
+        self._tuned_pose = self.pose = pose
+        if old is not None:
+            _close_later(old)
+        # the ROI graph is rebuilt with the new complexity on next use
+        self._roi_box = None
+
+    def _infer_roi(self, rgb):
+        h, w = rgb.shape[:2]
+        crop, box = self.roi.crop(rgb)
+
+        pose_landmarks = None
+        if box is not None:
+            if box != self._roi_box:
+                if self._roi_pose is not None:
+                    _close_later(self._roi_pose)
+                self._roi_pose = mp_pose.Pose(**self.pose_config)
+                self._roi_box = box
+            pose_landmarks = self._run_pose(crop, self._roi_pose)
+
+        if not pose_landmarks:
+            # no box yet, or lost inside it: detect on the full frame
+            box = None
+            pose_landmarks = self._run_pose(rgb)
+
+        landmarks = None
+        if pose_landmarks:
+            landmarks = to_full_frame(
+                LandmarkFrame.from_mediapipe(pose_landmarks), box, w, h)
+        self.roi.update(landmarks, w, h)
+
+        if box is not None:
+            pose_landmarks = to_pose_landmarks(landmarks)
+        return pose_landmarks, landmarks
+
+    def close(self):
+        if self._roi_pose is not None:
+            self._roi_pose.close()
+            self._roi_pose = None
+            self._roi_box = None
+        if self._tuned_pose is not None:
+            self._tuned_pose.close()
+            self._tuned_pose = None
+
+    def _step(self, landmarks, pose_landmarks):
+        timestamp = self._times.popleft()
+        if timestamp is not None:
+            self.clock.now = timestamp
+        self.track(landmarks)
+
+        # per-frame snapshot; the pipelined renderer runs behind the
+        # tracker. The angles dict is shared, not copied: the tracker
+        # replaces it on update rather than changing it
+        result = FrameResult(
+            self.tracked, self.clock(),
+            None if landmarks is None else landmarks.data,
+            self.tracker.smoothed_angles,
+            self.counter, self.stage, self.posture, self.progress,
+            pose_landmarks=pose_landmarks)
+        self.tracked += 1
+        return result
+
+    def track(self, landmarks):
+        """
+        Tracker step for one frame's LandmarkFrame (None = no pose),
+        at the current self.clock time.
+        """
+        if self.start_time is None:
+            self.start_time = self.last_time = self.clock()
+            if self.origin is None:
+                self.origin = self.start_time
+
+        if landmarks is not None:
+            self.tracker.update_landmarks(landmarks)
+
+        if self.recorded is not None:
+            self.recorded.append(landmarks)
+
+        if self.archive is not None:
+            self.archive.append(landmarks, self.clock() - self.origin)
+
+        # read straight from the state machine's arrays (no result list)
+        i = self._definition
+        if i is None:
+            self.posture, self.progress = False, 0.0
+        else:
+            self.tracker.step_exercise(i)
+            machine = self.tracker.machine
+            self.counter = int(machine.counter[i])
+            self.stage = STAGE_NAMES[int(machine.stage[i])]
+            self.posture = bool(machine.posture[i])
+            self.progress = float(machine.progress[i])
+        self._prev_time, self.last_time = self.last_time, self.clock()
+
+        if self.posture:
+            self.good_frames += 1
+        else:
+            self.bad_frames += 1
+
+        if self.timeline is not None:
+            self.timeline.append(self.counter, self.stage, self.posture,
+                                 self.progress)
+
+
+def replay_landmarks(exercise_type, landmarks, fps=None, timestamps=None,
+                     timeline=False):
+    """
+    Runs the rep state machine over an (N, 33, 4) landmark stack or a
+    LandmarkArchive (NaN rows = no pose) using video time, not wall time,
+    for min_rep_interval: timestamps if given, else frame index / fps.
+    Returns the _Analyzer with the final state.
+    """
+    analyzer = _Analyzer(exercise_type, None, timeline=timeline)
+
+    for i, data in enumerate(landmarks):
+        analyzer.clock.now = timestamps[i] if timestamps is not None else i / fps
+        analyzer.track(_cached_frame(data))
+
+    return analyzer
+
+
+def render_frame(rgb, pose_landmarks, exercise_type, counter, stage,
+                 posture, smoothed, out=None, color_order="bgr", joints=None):
+    """
+    Draws skeleton, score table and debug text; returns a BGR frame,
+    or an RGB one with color_order="rgb" (no channel swap at all).
+    out, if given, is an (h, w, 3) uint8 buffer the frame is drawn into.
+    joints (landmark indices, e.g. TypeOfExercise.joints) limits the
+    skeleton to those joints and the bones between them.
+    Headless runs skip this; call it on demand for frames you want to see
+    (pose_landmarks may come from to_pose_landmarks).
+    """
+    if color_order == "rgb":
+        if out is None:
+            frame = rgb.copy()
+        else:
+            frame = out
+            np.copyto(frame, rgb)
+    else:
+        frame = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
+
+    def c(color):
+        # colors below are written BGR, like the rest of OpenCV
+        return color[::-1] if color_order == "rgb" else color
+
+    # the angles the rep is counted on
+    debug = []
+    definition = EXERCISE_DEFINITIONS.get(exercise_type)
+    if definition is not None:
+        for channel in definition.channels:
+            debug.append(f"{ANGLE_LABELS[channel]}: "
+                         f"{fmt_ang(smoothed.get(channel))}")
+
+    posture_text = "Good" if posture else "Bad"
+    frame = score_table(exercise_type, frame, counter, posture_text,
+                        color=c((0, 0, 255)))
+
+    color = c((0, 255, 0) if posture else (0, 0, 255))
+
+    if pose_landmarks and joints is not None:
+        _draw_joints(frame, pose_landmarks, joints, color)
+    elif pose_landmarks:
+        mp_drawing.draw_landmarks(
+            frame,
+            pose_landmarks,
+            mp_pose.POSE_CONNECTIONS,
+            mp_drawing.DrawingSpec(
+                color=(255, 255, 255),
+                thickness=2,
+                circle_radius=2
+            ),
+            mp_drawing.DrawingSpec(
+                color=color,
+                thickness=3,
+                circle_radius=3
+            ),
+        )
+
+    for i, txt in enumerate(debug):
+        cv2.putText(frame, txt, (10, 30 + i * 25),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (255, 255, 255), 2)
+
+    cv2.putText(frame, f"Stage: {stage}", (10, 440),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+    cv2.putText(frame, f"Reps: {counter}", (10, 470),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                (255, 255, 255), 2)
+
+    return frame
+
+
+def _draw_joints(frame, pose_landmarks, joints, color):
+    # the skeleton restricted to joints, styled like the full one
+    joints = set(joints)
+    connections = [c for c in mp_pose.POSE_CONNECTIONS
+                   if c[0] in joints and c[1] in joints]
+    mp_drawing.draw_landmarks(
+        frame,
+        pose_landmarks,
+        connections,
+        None,
+        mp_drawing.DrawingSpec(color=color, thickness=3),
+    )
+
+    h, w = frame.shape[:2]
+    points = pose_landmarks.landmark
+    for idx in sorted(joints):
+        lm = points[idx]
+        if lm.visibility < 0.5 or not (0 <= lm.x <= 1 and 0 <= lm.y <= 1):
+            continue
+        px = (min(int(lm.x * w), w - 1), min(int(lm.y * h), h - 1))
+        cv2.circle(frame, px, 3, (224, 224, 224), 2)
+        cv2.circle(frame, px, 2, (255, 255, 255), 2)
+
+
+def _put(q, item, stop):
+    # bounded put that gives up once the session is stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _run_sequential(reader, analyzer, on_frame, stop_callback):
+    """Returns True if the source ran to its end (not stopped)."""
+    while reader.cap.isOpened():
+
+        # Stop condition from Streamlit
+        if stop_callback and stop_callback() is False:
+            return False
+
+        rgb, timestamp = reader.read()
+        if rgb is None:
+            for item in analyzer.flush():
+                on_frame(*item)
+            return True
+
+        for item in analyzer.feed(rgb, timestamp):
+            on_frame(*item)
+
+    return False
+
+
+def _run_pipelined(reader, analyzer, on_frame, stop_callback, queue_size):
+    """
+    decode thread -> inference thread -> render/display (caller's thread).
+    Single-threaded stages joined by FIFO queues keep frames in order,
+    so the tracker sees exactly the same sequence as the sequential loop.
+    Rendering stays on the calling thread because UI callbacks
+    (e.g. Streamlit) must run there.
+    """
+    decoded = queue.Queue(maxsize=queue_size)
+    analyzed = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    eof = []
+
+    def decode():
+        try:
+            while reader.cap.isOpened() and not stop.is_set():
+                frame = reader.read()
+                if frame[0] is None:
+                    eof.append(True)
+                    break
+                if not _put(decoded, frame, stop):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(decoded, _DONE, stop)
+
+    def infer():
+        try:
+            while True:
+                frame = _get(decoded, stop)
+                if frame is _DONE:
+                    ready = analyzer.flush()
+                else:
+                    ready = analyzer.feed(*frame)
+                for item in ready:
+                    if not _put(analyzed, item, stop):
+                        return
+                if frame is _DONE:
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(analyzed, _DONE, stop)
+
+    workers = [threading.Thread(target=decode, daemon=True),
+               threading.Thread(target=infer, daemon=True)]
+    for w in workers:
+        w.start()
+
+    finished = False
+    try:
+        while True:
+            if stop_callback and stop_callback() is False:
+                break
+
+            item = _get(analyzed, stop)
+            if item is _DONE:
+                finished = bool(eof)
+                break
+            on_frame(*item)
+    finally:
+        stop.set()
+        for w in workers:
+            w.join()
+
+    if errors:
+        raise errors[0]
+
+    return finished
+
+
+def _run_segments(reader, analyzer, on_frame, stop_callback, plan, index):
+    """
+    Decodes only the planned [(warm_first, first, stop)] frame ranges:
+    seeks to the keyframe at or before warm_first, skips to warm_first
+    without converting frames, warms the trackers up on [warm_first,
+    first) and analyzes [first, stop). Frame times come from the seek
+    index. Returns True if every segment ran to its end.
+    """
+    cap = reader.cap
+    pos = 0  # frame the next read returns
+    for warm_first, first, stop in plan:
+        target = index.seek_point(warm_first)
+        # already between that keyframe and warm_first: reading on is
+        # cheaper than seeking back
+        if not target <= pos <= warm_first:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            pos = target
+        while pos < warm_first:
+            if not cap.grab():
+                return False
+            pos += 1
+
+        analyzer.begin_segment(pos)
+        while pos < first:
+            rgb, _ = reader.read()
+            if rgb is None:
+                return False
+            analyzer.warm(rgb, index.timestamps[pos])
+            reader.pool.release(rgb)
+            pos += 1
+
+        while pos < stop:
+            if stop_callback and stop_callback() is False:
+                return False
+            rgb, _ = reader.read()
+            if rgb is None:
+                break
+            for item in analyzer.feed(rgb, index.timestamps[pos]):
+                on_frame(*item)
+            pos += 1
+
+        for item in analyzer.flush():
+            on_frame(*item)
+
+    return True
+
+
 def start_engine(
     exercise_type,
     video_source,
     display_callback=None,
-    stop_callback=None
+    stop_callback=None,
+    record_landmarks=False,
+    pipelined=False,
+    queue_size=4,
+    report_label=None,
+    cache=True,
+    archive_path=None,
+    headless=False,
+    adaptive=False,
+    keyframe_interval=3,
+    roi=False,
+    target_fps=None,
+    color_order="bgr",
+    overlay="full",
+    decoder="opencv",
+    decode_fps=None,
+    start=None,
+    end=None,
+    segments=None,
+    warmup=1.0
 ):
     """
     Core fitness tracking engine.
     Can be used by:
     - Streamlit
     - Terminal
-    - Flask / FastAPI
-    """
+    - Flask / FastAPI (async code: async_engine.AsyncSession)
+    - Plain loops pulling one FrameResult at a time (EngineStream)
 
-    cap = cv2.VideoCapture(video_source)
-    cap.set(3, 800)
-    cap.set(4, 480)
+    record_landmarks=True adds the session's (N, 33, 4) landmark array
+    to the result (see utils.detection_body_parts_session for export).
 
-    tracker = TypeOfExercise(None)
-    counter = 0
-    stage = None
-    posture = False
-    progress = 0.0
+    pipelined=True runs decode and pose inference on their own threads,
+    connected by queues of at most queue_size frames, so they overlap
+    with rendering. Rep counting still sees frames in order.
 
-    start_time = time.time()
-    good_frames = 0
-    bad_frames = 0
-    prev_time = 0
+    cache=True looks video files up in the landmark cache (keyed by file
+    content + POSE_CONFIG + FRAME_SIZE) and skips pose inference on a hit;
+    without a display_callback a hit is replayed without decoding at all.
+    A complete uncached run stores its landmarks for next time.
 
-    with mp_pose.Pose(min_detection_confidence=0.5,
-                      min_tracking_confidence=0.5) as pose:
+    archive_path writes the session's landmarks as a LandmarkArchive.
 
-        while cap.isOpened():
+    headless=True skips all rendering (no BGR conversion, overlay or
+    skeleton drawing): display_callback, if any, receives frame=None, and
+    the result carries a per-frame "timeline" of reps / stage / posture /
+    progress arrays. Use render_frame for frames you do want drawn.
 
-            # Stop condition from Streamlit
-            if stop_callback and stop_callback() is False:
-                break
+    adaptive=True runs pose inference only on keyframes chosen by a
+    KeyframeScheduler (at least every keyframe_interval frames, more
+    often on motion or near a rep transition) and interpolates the
+    landmarks in between.
 
-            ret, frame = cap.read()
-            if not ret:
-                break
+    roi=True crops each inference input to the previous frame's padded
+    landmark box (full frame when tracking is lost) and maps landmarks
+    back to full-frame coordinates. It is off by default because it does
+    not speed inference up yet (see roi.RoiTracker).
 
-            frame = cv2.resize(frame, (800, 480))
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            rgb.flags.writeable = False
+    target_fps autotunes model complexity and inference resolution from
+    measured inference latency (see autotune.LatencyAutotuner), stepping
+    down under load and back up when there is headroom.
 
-            results = pose.process(rgb)
+    Adaptive, ROI and autotuned landmarks are never written to the
+    landmark cache.
 
-            rgb.flags.writeable = True
-            frame = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    Rep timing and the reported duration follow media time (see
+    media_clock): video timestamps for files, capture time for live
+    sources, so a file analyzed faster than real time counts the same.
 
-            landmarks = None
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
+    Frames are decoded, resized and converted into pooled buffers and
+    drawn into one reused output buffer in the color order display
+    callers need (color_order="rgb" for Streamlit / PIL, "bgr" for
+    cv2.imshow). The frame passed to display_callback is only valid
+    until it returns; copy it to keep it.
 
-            if landmarks is not None:
-                tracker.update_landmarks(landmarks)
+    overlay="required" draws only the joints the exercise's rep and
+    posture rules depend on (TypeOfExercise.joints), not the full body.
 
-            counter, stage, posture, progress = tracker.calculate_exercise(
-                exercise_type, counter, stage
-            )
+    decoder="ffmpeg" decodes through an ffmpeg subprocess that scales,
+    converts to RGB and (with decode_fps) decimates on its own threads,
+    instead of cv2 resize / cvtColor on ours; worth it for large inputs
+    such as 1080p phone videos. decode_fps needs the ffmpeg decoder.
 
-            if posture:
-                good_frames += 1
-            else:
-                bad_frames += 1
+    start / end (seconds) or segments=[(start, end), ...] (None = video
+    start / end) analyze only those parts of a video file. Frame times
+    come from a per-video seek index (seek_index, built once and cached),
+    decoding starts at the nearest keyframe, and the `warmup` seconds
+    before each segment are inferred and tracked without being counted,
+    so pose tracking, smoothing and the rep stage are settled at the
+    segment's first frame. Segments always run sequentially; duration,
+    accuracy, recorded landmarks and the timeline cover only the
+    segments, and the result lists them as "segments". ValueError if
+    no segment overlaps the video.
+    """
+    if decode_fps and decoder != "ffmpeg":
+        raise ValueError("decode_fps needs decoder='ffmpeg'")
 
-            smoothed = tracker.get_smoothed_angles()
-            debug = []
+    if start is not None or end is not None:
+        segments = [(start, end)] + list(segments or [])
+    index = plan = None
+    if segments:
+        if not (isinstance(video_source, str)
+                and os.path.isfile(video_source)):
+            raise ValueError("segments need a video file")
+        if decoder != "opencv":
+            raise ValueError("segments need decoder='opencv' (seeking)")
+        index = load_index(video_source)
+        plan = plan_segments(index, segments, round(warmup * index.fps))
+        if not plan:
+            length = index.timestamps[-1] if len(index) else 0.0
+            raise ValueError(f"no segment overlaps the video "
+                             f"({length:.1f} s long): {segments}")
 
-            if exercise_type == "squat":
-                debug.append(f"Knee L: {fmt_ang(smoothed.get('left_knee'))}")
-                debug.append(f"Knee R: {fmt_ang(smoothed.get('right_knee'))}")
+    store = key = cached = None
+    if cache and isinstance(video_source, str) and os.path.isfile(video_source):
+        store = LandmarkCache()
+        params = dict(POSE_CONFIG, frame_size=list(FRAME_SIZE))
+        if decoder != "opencv":
+            # other scaler, maybe fewer frames: other landmarks
+            params.update(decoder=decoder, decode_fps=decode_fps)
+        key = cache_key(video_source, params)
+        cached = store.get(key)
 
-            elif exercise_type in ("push-up", "pull-up"):
-                debug.append(f"Elbow L: {fmt_ang(smoothed.get('left_elbow'))}")
-                debug.append(f"Elbow R: {fmt_ang(smoothed.get('right_elbow'))}")
+    if cached is not None and display_callback is None and not (
+            plan is not None and archive_path):
+        return _replay_cached(exercise_type, video_source, cached,
+                              record_landmarks, report_label, archive_path,
+                              headless, decode_fps, index, plan)
 
-            elif exercise_type == "sit-up":
-                debug.append(f"Torso: {fmt_ang(smoothed.get('abdomen'))}")
+    cap = open_capture(video_source, decoder, decode_fps)
 
-            posture_text = "Good" if posture else "Bad"
-            frame = score_table(exercise_type, frame, counter, posture_text)
+    archive = None
+    if archive_path:
+        archive = LandmarkArchiveWriter(
+            archive_path, fps=cap.get(cv2.CAP_PROP_FPS) or None,
+            exercise=exercise_type,
+            metadata={"source": str(video_source)})
 
-            color = (0, 255, 0) if posture else (0, 0, 255)
+    # FPS shown to the display is processing throughput, so wall time
+    prev_time = 0
 
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(
-                    frame,
-                    results.pose_landmarks,
-                    mp_pose.POSE_CONNECTIONS,
-                    mp_drawing.DrawingSpec(
-                        color=(255, 255, 255),
-                        thickness=2,
-                        circle_radius=2
-                    ),
-                    mp_drawing.DrawingSpec(
-                        color=color,
-                        thickness=3,
-                        circle_radius=3
-                    ),
-                )
+    # cached landmarks are free, so only schedule keyframes on a miss
+    scheduler = None
+    if adaptive and cached is None:
+        scheduler = KeyframeScheduler(max_interval=keyframe_interval)
+
+    # a full-rate cache miss records the landmarks so the next run can
+    # skip inference
+    autotuner = None
+    if target_fps and cached is None:
+        autotuner = LatencyAutotuner(target_fps)
+
+    fill_cache = (key is not None and cached is None and scheduler is None
+                  and not roi and autotuner is None and plan is None)
+    record = record_landmarks or fill_cache
 
-            for i, txt in enumerate(debug):
-                cv2.putText(frame, txt, (10, 30 + i * 25),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                            (255, 255, 255), 2)
+    # every frame in flight (queues, held-back keyframe gaps, the one
+    # being drawn) needs its own buffer; the pool grows if that is short
+    in_flight = 2
+    if pipelined:
+        in_flight += 2 * queue_size + 1
+    if scheduler is not None:
+        in_flight += keyframe_interval
+    reader = frame_reader(cap, in_flight, source_clock(video_source, cap))
+    out = None if headless else np.empty(reader.pool.shape, np.uint8)
 
-            cv2.putText(frame, f"Stage: {stage}", (10, 440),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    with mp_pose.Pose(**POSE_CONFIG) as pose:
 
-            cv2.putText(frame, f"Reps: {counter}", (10, 470),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8,
-                        (255, 255, 255), 2)
+        analyzer = _Analyzer(exercise_type, pose, record, cached=cached,
+                             archive=archive, timeline=headless,
+                             scheduler=scheduler,
+                             roi=RoiTracker() if roi else None,
+                             autotuner=autotuner)
+        joints = analyzer.tracker.joints if overlay == "required" else None
+
+        def on_frame(rgb, result):
+            nonlocal prev_time
+
+            frame = None
+            if not headless:
+                frame = render_result(
+                    rgb, result, exercise_type,
+                    out=out, color_order=color_order, joints=joints
+                )
+            reader.pool.release(rgb)
 
             curr_time = time.time()
             fps = int(1 / (curr_time - prev_time)) if prev_time else 0
@@ -142,23 +930,266 @@ def start_engine(
             if display_callback:
                 display_callback(
                     frame,
-                    counter,
-                    stage,
-                    posture,
-                    progress,
+                    result.reps,
+                    result.stage,
+                    result.posture,
+                    result.progress,
                     fps
                 )
 
+        try:
+            if plan is not None:
+                finished = _run_segments(reader, analyzer, on_frame,
+                                         stop_callback, plan, index)
+            elif pipelined:
+                finished = _run_pipelined(reader, analyzer, on_frame,
+                                          stop_callback, queue_size)
+            else:
+                finished = _run_sequential(reader, analyzer, on_frame,
+                                           stop_callback)
+        finally:
+            analyzer.close()
+            if archive is not None:
+                archive.close()
+
+    cap.release()
+
+    duration = int(analyzer.duration)
+    result = write_report(exercise_type, analyzer.counter, duration,
+                          analyzer.good_frames, analyzer.bad_frames,
+                          label=report_label)
+
+    landmarks = None
+    if analyzer.recorded is not None:
+        landmarks = stack_landmark_frames(analyzer.recorded)
+
+    # a run that decoded nothing is not a landmark set worth serving
+    if finished and fill_cache and len(landmarks):
+        store.put(key, landmarks)
+
+    if record_landmarks:
+        if cached is not None:
+            landmarks = cached
+            if plan is not None:
+                landmarks = _segment_rows(cached, plan)
+        result["landmarks"] = landmarks
+
+    if analyzer.timeline is not None:
+        result["timeline"] = analyzer.timeline.to_dict()
+
+    if plan is not None:
+        result["segments"] = _segment_times(index, plan)
+
+    if scheduler is not None:
+        result["inferred_frames"] = scheduler.keyframes
+
+    if autotuner is not None:
+        result["model_complexity"] = autotuner.model_complexity
+        result["inference_scale"] = autotuner.scale
+
+    return result
+
+
+def _replay_cached(exercise_type, video_path, cached, record_landmarks,
+                   report_label, archive_path=None, timeline=False,
+                   decode_fps=None, index=None, plan=None):
+    # Cache hit with nothing to display: no decode, no inference
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
     cap.release()
+    if decode_fps:
+        fps = min(fps, decode_fps)
+
+    if plan is not None:
+        analyzer = _replay_segments(exercise_type, cached, index, plan,
+                                    timeline)
+    else:
+        analyzer = replay_landmarks(exercise_type, cached, fps,
+                                    timeline=timeline)
+
+    if archive_path:
+        write_archive(archive_path, cached, fps=fps, exercise=exercise_type,
+                      metadata={"source": str(video_path)})
+
+    duration = int(analyzer.duration)
+    result = write_report(exercise_type, analyzer.counter, duration,
+                          analyzer.good_frames, analyzer.bad_frames,
+                          label=report_label)
+
+    if record_landmarks:
+        result["landmarks"] = cached if plan is None \
+            else _segment_rows(cached, plan)
+
+    if analyzer.timeline is not None:
+        result["timeline"] = analyzer.timeline.to_dict()
+
+    if plan is not None:
+        result["segments"] = _segment_times(index, plan)
+
+    return result
+
+
+def _replay_segments(exercise_type, landmarks, index, plan, timeline=False):
+    # _run_segments over cached landmarks: same warm-up, no decoding
+    analyzer = _Analyzer(exercise_type, None, timeline=timeline)
+    n = min(len(landmarks), len(index))
+    for warm_first, first, stop in plan:
+        analyzer.begin_segment(warm_first)
+        for i in range(min(warm_first, n), min(first, n)):
+            analyzer.clock.now = index.timestamps[i]
+            analyzer.warm_track(_cached_frame(landmarks[i]))
+        for i in range(min(first, n), min(stop, n)):
+            analyzer.clock.now = index.timestamps[i]
+            analyzer.track(_cached_frame(landmarks[i]))
+    return analyzer
+
 
-    # ---------------- REPORT ----------------
-    end_time = time.time()
-    duration = int(end_time - start_time)
+def _segment_rows(landmarks, plan):
+    if not plan:
+        return np.empty((0,) + landmarks.shape[1:], dtype=landmarks.dtype)
+    return np.concatenate([landmarks[first:stop]
+                           for _, first, stop in plan])
+
+
+def _segment_times(index, plan):
+    # [(first frame time, last frame time)] in seconds
+    t = index.timestamps
+    return [(round(float(t[first]), 3), round(float(t[stop - 1]), 3))
+            for _, first, stop in plan]
+
+
+# -------------------------
+# Pull-based API
+# -------------------------
+class EngineStream:
+    """
+    One analysis session as a plain iterator of FrameResult, one per
+    frame, in order:
+
+        with EngineStream("squat", "squat.mp4") as stream:
+            for r in stream:
+                print(r.index, r.timestamp, r.reps, r.stage)
+        report = stream.result
+
+    Nothing runs ahead of the consumer: the next frame is decoded and
+    analyzed only when it is asked for, so a slow consumer slows the
+    session down instead of queueing frames (live sources then simply
+    skip what the camera produced in between).
+
+    With timings=True each result carries timings ("decode", "infer",
+    "render" seconds; with adaptive=True skipped frames are inferred with
+    the next keyframe, which carries the cost); otherwise it is None and
+    no per-frame dict is built. With render=True result.frame is
+    the drawn frame in color_order; the buffer is reused, so copy it to
+    keep it past the next iteration.
+
+    Leaving the with block, close() or running to the end releases the
+    capture and Pose graph and writes the report (start_engine's result
+    dict) to .result.
+    """
+
+    def __init__(self, exercise_type, video_source, render=False,
+                 color_order="bgr", overlay="full", report_label=None,
+                 adaptive=False, keyframe_interval=3, timings=False):
+        self.exercise_type = exercise_type
+        self.video_source = video_source
+        self.render = render
+        self.color_order = color_order
+        self.overlay = overlay
+        self.report_label = report_label
+        self.adaptive = adaptive
+        self.keyframe_interval = keyframe_interval
+        self.timings = timings
+        self.result = None
+        self._gen = None
+
+    def __iter__(self):
+        if self._gen is None:
+            self._gen = self._frames()
+        return self._gen
+
+    def close(self):
+        if self._gen is not None:
+            self._gen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _frames(self):
+        cap = open_capture(self.video_source)
+        scheduler = None
+        count = 2
+        if self.adaptive:
+            scheduler = KeyframeScheduler(max_interval=self.keyframe_interval)
+            count += self.keyframe_interval
+        reader = frame_reader(cap, count, source_clock(self.video_source, cap))
+        out = np.empty(reader.pool.shape, np.uint8) if self.render else None
+        pose = mp_pose.Pose(**POSE_CONFIG)
+        analyzer = _Analyzer(self.exercise_type, pose, scheduler=scheduler)
+        joints = analyzer.tracker.joints \
+            if self.overlay == "required" else None
+
+        try:
+            while True:
+                start = time.perf_counter()
+                rgb, timestamp = reader.read()
+                decoded = time.perf_counter()
+                if rgb is None:
+                    ready = analyzer.flush()
+                else:
+                    ready = analyzer.feed(rgb, timestamp)
+                inferred = time.perf_counter()
+
+                for i, (held, result) in enumerate(ready):
+                    last = i == len(ready) - 1
+                    render = 0.0
+                    if self.render:
+                        tick = time.perf_counter()
+                        result.frame = render_result(
+                            held, result, self.exercise_type, out=out,
+                            color_order=self.color_order, joints=joints)
+                        render = time.perf_counter() - tick
+                    reader.pool.release(held)
+                    if self.timings:
+                        result.timings = {
+                            "decode": decoded - start if last else 0.0,
+                            "infer": inferred - decoded if last else 0.0,
+                            "render": render,
+                        }
+                    yield result
+
+                if rgb is None:
+                    break
+        finally:
+            cap.release()
+            analyzer.close()
+            pose.close()
+            self.result = write_report(
+                self.exercise_type, analyzer.counter, int(analyzer.duration),
+                analyzer.good_frames, analyzer.bad_frames,
+                label=self.report_label)
+
+
+# -------------------------
+# Report
+# -------------------------
+def write_report(exercise_type, counter, duration, good_frames, bad_frames,
+                 label=None):
+    """
+    Writes the text report, appends history.csv, returns the summary.
+    label (e.g. the video name) keeps parallel runs from sharing a file name.
+    """
     total_frames = good_frames + bad_frames
     accuracy = (good_frames / total_frames) * 100 if total_frames else 0
 
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    report_name = f"{exercise_type}_{timestamp}.txt"
+    if label:
+        report_name = f"{exercise_type}_{label}_{timestamp}.txt"
+    else:
+        report_name = f"{exercise_type}_{timestamp}.txt"
     report_path = os.path.join(REPORT_DIR, report_name)
 
     with open(report_path, "w") as f:
@@ -190,10 +1221,12 @@ def start_engine(
             round(accuracy, 2)
         ])
 
-    return {
+    result = {
         "exercise": exercise_type,
         "reps": counter,
         "duration": duration,
         "accuracy": accuracy,
         "report_path": report_path
     }
+
+    return result
@@ -0,0 +1,169 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+import cv2
+
+
+class FFmpegCapture:
+    """
+    A cv2.VideoCapture stand-in that decodes through an ffmpeg
+    subprocess: ffmpeg scales to `size` and converts to RGB (and with
+    fps, drops frames down to that rate) on its own threads, and pipes
+    raw rgb24 frames of exactly the target size. Read it with
+    FFmpegReader, which fills pooled buffers straight from the pipe.
+
+    Supports what the engine asks of a capture: isOpened(), release()
+    and get() for CAP_PROP_FPS (the output rate), CAP_PROP_FRAME_COUNT
+    and CAP_PROP_POS_MSEC (index / fps, so media_clock.VideoClock works
+    unchanged). Camera indices map to v4l2 (Linux) / avfoundation
+    (macOS) devices.
+
+    If ffmpeg exits with an error, reading past the last frame raises
+    RuntimeError with its message instead of looking like a normal end
+    of stream.
+    """
+
+    def __init__(self, source, size, fps=None, ffmpeg=None):
+        self.source = source
+        self.size = tuple(size)
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        if self.ffmpeg is None:
+            raise RuntimeError("ffmpeg not found; install it or use "
+                               "decoder='opencv'")
+
+        # files: rate and length from container metadata (no decoding);
+        # cameras and streams are not opened twice
+        source_fps, source_frames = 30.0, 0.0
+        if isinstance(source, str) and os.path.isfile(source):
+            probe = cv2.VideoCapture(source)
+            source_fps = probe.get(cv2.CAP_PROP_FPS) or 30.0
+            source_frames = probe.get(cv2.CAP_PROP_FRAME_COUNT)
+            probe.release()
+
+        # the fps filter would duplicate frames above the source rate
+        if fps and fps >= source_fps:
+            fps = None
+        self.fps = fps or source_fps
+        self.frame_count = source_frames * self.fps / source_fps
+        self.frames = 0
+        self.frame_bytes = self.size[0] * self.size[1] * 3
+
+        # stderr to a file, not a pipe: a chatty ffmpeg cannot block on it
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            self._command(fps), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=self._stderr,
+            bufsize=self.frame_bytes)
+        self._opened = True
+
+    def _command(self, fps):
+        w, h = self.size
+        filters = []
+        if fps:
+            # decimate before scaling, so dropped frames are never scaled
+            filters.append(f"fps={fps}")
+        # bilinear, like cv2.resize's default
+        filters.append(f"scale={w}:{h}:flags=bilinear")
+
+        return ([self.ffmpeg, "-nostdin", "-loglevel", "error"]
+                + _input_args(self.source)
+                + ["-an", "-sn", "-vf", ",".join(filters),
+                   "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"])
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            # after a read: the start time of the frame just read
+            return max(self.frames - 1, 0) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.size[0]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.size[1]
+        return 0.0
+
+    def set(self, prop, value):
+        # sizes are fixed at start; seeking is not supported on a pipe
+        return False
+
+    def read_into(self, buf):
+        """Fills buf (H x W x 3 uint8) with the next frame; False at EOF."""
+        if not self._opened:
+            return False
+        view = memoryview(buf).cast("B")
+        got = 0
+        while got < self.frame_bytes:
+            n = self._proc.stdout.readinto(view[got:])
+            if not n:
+                self._opened = False
+                self._check_exit()
+                return False
+            got += n
+        self.frames += 1
+        return True
+
+    def _check_exit(self):
+        returncode = self._proc.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with status {returncode}: "
+                               f"{message or 'no error output'}")
+
+    def release(self):
+        self._opened = False
+        proc = self._proc
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        self._stderr.close()
+
+
+def _input_args(source):
+    if isinstance(source, int):
+        if sys.platform.startswith("linux"):
+            return ["-f", "v4l2", "-i", f"/dev/video{source}"]
+        if sys.platform == "darwin":
+            return ["-f", "avfoundation", "-i", str(source)]
+        raise ValueError("camera indices need decoder='opencv' on this "
+                         "platform")
+    if isinstance(source, str) and os.path.isfile(source):
+        return ["-i", source]
+    # URLs (rtsp://, http://): keep latency low
+    return ["-fflags", "nobuffer", "-i", str(source)]
+
+
+class FFmpegReader:
+    """
+    FrameReader for an FFmpegCapture: frames arrive already scaled and
+    in RGB, and are read from the pipe straight into pooled buffers, so
+    nothing is converted on the Python side. Same read() contract as
+    frame_pool.FrameReader.
+    """
+
+    def __init__(self, cap, pool, clock=None):
+        if pool.shape != (cap.size[1], cap.size[0], 3):
+            raise ValueError("pool shape does not match the capture size")
+        self.cap = cap
+        self.size = cap.size
+        self.pool = pool
+        self.clock = clock
+
+    def read(self):
+        rgb = self.pool.acquire()
+        if not self.cap.read_into(rgb):
+            self.pool.release(rgb)
+            return None, None
+        timestamp = None
+        if self.clock is not None:
+            timestamp = self.clock.stamp(self.cap)
+        return rgb, timestamp
@@ -0,0 +1,75 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """
+    Recycles preallocated frame buffers of one shape.
+
+    Frames can be held for a while after decode (pipeline queues, the
+    keyframe scheduler's held-back frames), so size the pool for the
+    deepest path; if it still runs dry, acquire() allocates a new buffer
+    rather than blocking, and that buffer joins the pool on release().
+    """
+
+    def __init__(self, shape, count=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.allocated = count
+        self._free = [np.empty(self.shape, dtype) for _ in range(count)]
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.allocated += 1
+        return np.empty(self.shape, self.dtype)
+
+    def release(self, buf):
+        if buf.shape != self.shape:
+            return
+        with self._lock:
+            self._free.append(buf)
+
+
+class FrameReader:
+    """
+    Decodes a capture into pooled RGB frames of a fixed size:
+    cap.read, resize and BGR->RGB all write into reused buffers, so the
+    steady state allocates nothing per frame. With a clock (see
+    media_clock), each frame is stamped right after it is read. Not
+    thread-safe; use one reader per decoding thread.
+    """
+
+    def __init__(self, cap, size, pool, clock=None):
+        self.cap = cap
+        self.size = size
+        self.pool = pool
+        self.clock = clock
+        self._raw = None
+        self._resized = np.empty((size[1], size[0], 3), np.uint8)
+
+    def read(self):
+        """
+        (pooled RGB buffer, timestamp or None) for the next frame,
+        (None, None) at end of stream.
+        """
+        ret, raw = self.cap.read(self._raw)
+        if not ret:
+            return None, None
+        self._raw = raw
+        timestamp = None
+        if self.clock is not None:
+            timestamp = self.clock.stamp(self.cap)
+
+        h, w = raw.shape[:2]
+        bgr = raw
+        if (w, h) != self.size:
+            bgr = cv2.resize(raw, self.size, dst=self._resized)
+
+        rgb = self.pool.acquire()
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        return rgb, timestamp
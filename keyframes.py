@@ -0,0 +1,97 @@
+import cv2
+
+from landmark_frame import LandmarkFrame
+
+# Motion is measured on a tiny grayscale thumbnail of each frame
+MOTION_SIZE = (80, 48)
+
+
+def motion_thumbnail(rgb):
+    small = cv2.resize(rgb, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+
+class KeyframeScheduler:
+    """
+    Decides which frames go through pose inference.
+
+    A frame becomes a keyframe when any of these holds:
+    - max_interval frames have passed since the last keyframe
+    - its mean absolute difference to the last keyframe's thumbnail
+      exceeds motion_threshold (0-255 gray levels)
+    - the rep state machine is near a transition: a stage change is
+      being confirmed, or the rep signal is within edge_degrees of the
+      threshold its stage moves toward next (holding the top or bottom
+      position is far from it, so held poses stay cheap)
+    Skipped frames are held back and get landmarks linearly interpolated
+    between the surrounding keyframes, so the tracker still sees every
+    frame, in order, at up to max_interval - 1 frames of extra latency.
+    """
+
+    def __init__(self, max_interval=3, motion_threshold=3.0,
+                 edge_degrees=10.0):
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.edge_degrees = edge_degrees
+        self.keyframes = 0
+        self.frames = 0
+
+        self._last_thumb = None
+        self._last_landmarks = None
+        self._pending = []
+
+    def is_keyframe(self, rgb, analyzer):
+        self.frames += 1
+        thumb = motion_thumbnail(rgb)
+
+        key = (
+            self._last_thumb is None
+            or len(self._pending) + 1 >= self.max_interval
+            or analyzer.tracker.in_transition()
+            or analyzer.tracker.threshold_distance() <= self.edge_degrees
+            or cv2.absdiff(thumb, self._last_thumb).mean()
+            > self.motion_threshold
+        )
+
+        if key:
+            self._last_thumb = thumb
+            self.keyframes += 1
+        return key
+
+    def defer(self, rgb):
+        self._pending.append(rgb)
+
+    def anchor(self, rgb, landmarks):
+        """
+        A frame inferred outside the schedule (segment warm-up after a
+        seek) becomes the last keyframe the next frames are compared
+        and interpolated against.
+        """
+        self._last_thumb = motion_thumbnail(rgb)
+        self._last_landmarks = landmarks
+
+    def resolve(self, landmarks):
+        """
+        New keyframe landmarks arrived: returns (rgb, LandmarkFrame | None)
+        for every held-back frame, interpolated from the previous keyframe.
+        """
+        prev = self._last_landmarks
+        pending, self._pending = self._pending, []
+        self._last_landmarks = landmarks
+
+        if prev is None or landmarks is None:
+            # no pose on one side: hold the last known landmarks
+            return [(rgb, prev) for rgb in pending]
+
+        n = len(pending) + 1
+        out = []
+        for i, rgb in enumerate(pending, start=1):
+            t = i / n
+            data = prev.data + (landmarks.data - prev.data) * t
+            out.append((rgb, LandmarkFrame(data)))
+        return out
+
+    def drain(self):
+        """End of stream: held-back frames keep the last keyframe's landmarks."""
+        pending, self._pending = self._pending, []
+        return [(rgb, self._last_landmarks) for rgb in pending]
@@ -0,0 +1,167 @@
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from landmark_frame import LandmarkFrame, NUM_LANDMARKS
+
+# File layout:
+#   [0, HEADER_SIZE)   magic, version, JSON header length, JSON header
+#   data_offset        (n_frames, 33, 4) landmarks in `encoding` dtype
+#   timestamps_offset  (n_frames,) float64 seconds
+# Frames without a pose are stored as NaN rows.
+MAGIC = b"PRLA"
+VERSION = 1
+HEADER_SIZE = 4096
+ENCODINGS = {"float16": np.float16, "float32": np.float32}
+
+_PREFIX = struct.Struct("<4sHI")
+_FRAME_SHAPE = (NUM_LANDMARKS, 4)
+
+
+class LandmarkArchiveWriter:
+    """
+    Streams frames straight to disk; the header is finalized on close().
+    float16 halves the size of float32 at ~0.0005 normalized precision
+    (under half a pixel at 800 px wide).
+    """
+
+    def __init__(self, path, fps=None, exercise=None, encoding="float16",
+                 metadata=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding: {encoding}")
+        self.path = path
+        self.fps = fps
+        self.exercise = exercise
+        self.encoding = encoding
+        self.dtype = ENCODINGS[encoding]
+        self.metadata = dict(metadata or {})
+        self.timestamps = []
+
+        self._nan = np.full(_FRAME_SHAPE, np.nan, dtype=self.dtype)
+        self._f = open(path, "wb")
+        self._f.write(b"\0" * HEADER_SIZE)
+
+    def append(self, landmarks, timestamp=None):
+        """landmarks: LandmarkFrame, (33, 4) array, or None (no pose)."""
+        if landmarks is None:
+            data = self._nan
+        elif isinstance(landmarks, np.ndarray):
+            data = landmarks.astype(self.dtype).reshape(_FRAME_SHAPE)
+        else:
+            data = LandmarkFrame.from_mediapipe(landmarks).data \
+                .astype(self.dtype)
+
+        if timestamp is None:
+            fps = self.fps or 30.0
+            timestamp = len(self.timestamps) / fps
+
+        self._f.write(data.tobytes())
+        self.timestamps.append(float(timestamp))
+
+    def extend(self, landmarks, timestamps=None):
+        """Bulk append of an (N, 33, 4) stack (NaN rows = no pose)."""
+        landmarks = np.asarray(landmarks).reshape((-1,) + _FRAME_SHAPE)
+        if timestamps is None:
+            fps = self.fps or 30.0
+            start = len(self.timestamps)
+            timestamps = (start + np.arange(len(landmarks))) / fps
+
+        self._f.write(landmarks.astype(self.dtype).tobytes())
+        self.timestamps.extend(float(t) for t in timestamps)
+
+    def close(self):
+        if self._f is None:
+            return
+        n_frames = len(self.timestamps)
+        data_bytes = n_frames * NUM_LANDMARKS * 4 * np.dtype(self.dtype).itemsize
+
+        self._f.write(np.asarray(self.timestamps, dtype="<f8").tobytes())
+
+        header = {
+            "encoding": self.encoding,
+            "n_frames": n_frames,
+            "fps": self.fps,
+            "exercise": self.exercise,
+            "created": datetime.now().isoformat(),
+            "data_offset": HEADER_SIZE,
+            "timestamps_offset": HEADER_SIZE + data_bytes,
+            "metadata": self.metadata,
+        }
+        blob = json.dumps(header).encode("utf-8")
+        if _PREFIX.size + len(blob) > HEADER_SIZE:
+            raise ValueError("archive metadata too large for header")
+
+        self._f.seek(0)
+        self._f.write(_PREFIX.pack(MAGIC, VERSION, len(blob)) + blob)
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LandmarkArchive:
+    """
+    Read-only, memory-mapped view of an archive. Opening only parses the
+    header; slicing touches just the requested frames.
+
+        ar = LandmarkArchive("session.prla")
+        ar[1000:2000]                  # (1000, 33, 4) float32
+        ar.frames_between(60.0, 90.0)  # by timestamp
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, length = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"not a landmark archive: {path}")
+            if version > VERSION:
+                raise ValueError(f"unsupported archive version: {version}")
+            self.header = json.loads(f.read(length).decode("utf-8"))
+
+        n = self.header["n_frames"]
+        self.fps = self.header["fps"]
+        self.exercise = self.header["exercise"]
+        self.metadata = self.header["metadata"]
+
+        if n:
+            self._data = np.memmap(path, mode="r",
+                                   dtype=ENCODINGS[self.header["encoding"]],
+                                   offset=self.header["data_offset"],
+                                   shape=(n,) + _FRAME_SHAPE)
+            self.timestamps = np.memmap(path, mode="r", dtype="<f8",
+                                        offset=self.header["timestamps_offset"],
+                                        shape=(n,))
+        else:
+            self._data = np.empty((0,) + _FRAME_SHAPE, dtype=np.float32)
+            self.timestamps = np.empty(0)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        return np.asarray(self._data[index], dtype=np.float32)
+
+    def __iter__(self):
+        # decode in chunks rather than frame by frame
+        for start in range(0, len(self), 1024):
+            yield from self[start:start + 1024]
+
+    def frames_between(self, start_time, end_time):
+        """Frames with start_time <= timestamp < end_time."""
+        lo, hi = np.searchsorted(self.timestamps, [start_time, end_time])
+        return self[lo:hi]
+
+
+def write_archive(path, landmarks, timestamps=None, fps=None, exercise=None,
+                  encoding="float16", metadata=None):
+    """One-shot write of an (N, 33, 4) stack."""
+    with LandmarkArchiveWriter(path, fps, exercise, encoding,
+                               metadata) as writer:
+        writer.extend(landmarks, timestamps)
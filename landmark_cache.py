@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import mediapipe as mp
+import numpy as np
+
+CACHE_DIR = "landmark_cache"
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # 2 GB
+
+_CHUNK = 1024 * 1024
+
+
+def file_digest(path):
+    """sha256 of the file contents (renamed / copied videos still hit)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(video_path, pose_config):
+    """
+    Content hash + every Pose / preprocessing setting that affects
+    landmarks, and the mediapipe version (a model upgrade changes them).
+    """
+    config = json.dumps(pose_config, sort_keys=True)
+    h = hashlib.sha256()
+    h.update(file_digest(video_path).encode())
+    h.update(config.encode())
+    h.update(mp.__version__.encode())
+    return h.hexdigest()
+
+
+class LandmarkCache:
+    """
+    On-disk store of per-frame (N, 33, 4) landmark arrays, one .npy per key.
+    Size-capped; least recently used entries are evicted first
+    (file mtime is refreshed on every hit).
+
+    Safe to share between processes (parallel batch workers): entries
+    are written to a uniquely named temp file and renamed into place,
+    and entries removed by another process meanwhile are skipped.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            landmarks = np.load(path)
+        except (OSError, ValueError):
+            return None
+        if not len(landmarks):
+            # written by a run that decoded no frames: never valid
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process since; the data is loaded
+        return landmarks
+
+    def put(self, key, landmarks):
+        """Stores landmarks under key; an empty array is not stored."""
+        if not len(landmarks):
+            return
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp",
+                                         delete=False) as f:
+            try:
+                np.save(f, np.asarray(landmarks, dtype=np.float32))
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass  # another process evicted it first
+            total -= size
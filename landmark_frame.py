@@ -0,0 +1,67 @@
+import numpy as np
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+
+NUM_LANDMARKS = len(mp_pose.PoseLandmark)
+
+# Column layout of LandmarkFrame.data
+X, Y, Z, VISIBILITY = range(4)
+
+# Joint name -> row index, resolved once instead of per lookup
+JOINT_INDEX = {lm.name: lm.value for lm in mp_pose.PoseLandmark}
+JOINT_NAMES = [lm.name for lm in mp_pose.PoseLandmark]
+
+NOSE = JOINT_INDEX["NOSE"]
+MOUTH_LEFT = JOINT_INDEX["MOUTH_LEFT"]
+MOUTH_RIGHT = JOINT_INDEX["MOUTH_RIGHT"]
+LEFT_SHOULDER = JOINT_INDEX["LEFT_SHOULDER"]
+RIGHT_SHOULDER = JOINT_INDEX["RIGHT_SHOULDER"]
+LEFT_ELBOW = JOINT_INDEX["LEFT_ELBOW"]
+RIGHT_ELBOW = JOINT_INDEX["RIGHT_ELBOW"]
+LEFT_WRIST = JOINT_INDEX["LEFT_WRIST"]
+RIGHT_WRIST = JOINT_INDEX["RIGHT_WRIST"]
+LEFT_HIP = JOINT_INDEX["LEFT_HIP"]
+RIGHT_HIP = JOINT_INDEX["RIGHT_HIP"]
+LEFT_KNEE = JOINT_INDEX["LEFT_KNEE"]
+RIGHT_KNEE = JOINT_INDEX["RIGHT_KNEE"]
+LEFT_ANKLE = JOINT_INDEX["LEFT_ANKLE"]
+RIGHT_ANKLE = JOINT_INDEX["RIGHT_ANKLE"]
+
+
+class LandmarkFrame:
+    """
+    One frame of pose landmarks as a contiguous (33, 4) float32 array.
+    Columns are x, y, z, visibility; rows follow mp_pose.PoseLandmark.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = np.ascontiguousarray(data, dtype=np.float32)
+
+    @classmethod
+    def from_mediapipe(cls, landmarks):
+        """
+        Accepts results.pose_landmarks, its .landmark list,
+        or an existing LandmarkFrame (returned as-is).
+        """
+        if isinstance(landmarks, cls):
+            return landmarks
+        if hasattr(landmarks, "landmark"):
+            landmarks = landmarks.landmark
+
+        values = (v for lm in landmarks
+                  for v in (lm.x, lm.y, lm.z, lm.visibility))
+        data = np.fromiter(values, dtype=np.float32,
+                           count=NUM_LANDMARKS * 4)
+        return cls(data.reshape(NUM_LANDMARKS, 4))
+
+    def part(self, body_part_name):
+        """Same [x, y, visibility] triple as utils.detection_body_part."""
+        row = self.data[JOINT_INDEX[body_part_name]]
+        return [float(row[X]), float(row[Y]), float(row[VISIBILITY])]
+
+    def xy(self):
+        """x, y columns in float64 so angle math matches the scalar path."""
+        return self.data[:, :2].astype(np.float64)
@@ -0,0 +1,99 @@
+import struct
+
+import numpy as np
+
+from landmark_frame import NUM_LANDMARKS, X, Y, VISIBILITY
+from types_of_exercise import EXERCISE_DEFINITIONS
+
+# One frame for client-side drawing (all little-endian):
+#   header   version u8, flags u8, stage u8, progress u8 (0-255),
+#            exercise u8 (index into EXERCISES), reps u16,
+#            frame index u32, timestamp u32 (ms)
+#   visible  33-bit mask, 5 bytes, landmark i is bit i % 8 of byte i // 8
+#   points   33 x 3 bytes: x and y quantized to 12 bits each over [0, 1]
+#            (x >> 4, (x & 15) << 4 | y >> 8, y & 255)
+# visible and points are only present when FLAG_POSE is set: 119 bytes
+# per frame with a pose, 15 without.
+VERSION = 1
+FLAG_POSE = 1
+FLAG_POSTURE = 2
+
+EXERCISES = tuple(EXERCISE_DEFINITIONS)
+STAGES = (None, "down", "up")
+
+# A landmark is sent as visible under the same rule the renderer draws it
+VISIBILITY_THRESHOLD = 0.5
+
+_HEADER = struct.Struct("<BBBBBHII")
+_MASK_SIZE = (NUM_LANDMARKS + 7) // 8
+_SCALE = 4095
+
+HEADER_SIZE = _HEADER.size
+POSE_SIZE = HEADER_SIZE + _MASK_SIZE + 3 * NUM_LANDMARKS
+
+
+def encode_packet(result, exercise_type):
+    """engine.FrameResult -> bytes (see the layout above)."""
+    flags = FLAG_POSTURE if result.posture else 0
+    data = result.landmarks
+    if data is not None:
+        flags |= FLAG_POSE
+    exercise = EXERCISES.index(exercise_type) \
+        if exercise_type in EXERCISES else 255
+
+    header = _HEADER.pack(
+        VERSION, flags, STAGES.index(result.stage),
+        round(min(max(result.progress, 0.0), 1.0) * 255),
+        exercise, min(result.reps, 0xFFFF), result.index & 0xFFFFFFFF,
+        round(result.timestamp * 1000) & 0xFFFFFFFF)
+    if data is None:
+        return header
+
+    xy = data[:, [X, Y]]
+    visible = ((data[:, VISIBILITY] >= VISIBILITY_THRESHOLD) &
+               (xy >= 0).all(axis=1) & (xy <= 1).all(axis=1))
+    mask = np.packbits(visible, bitorder="little")
+
+    q = np.rint(np.clip(xy, 0.0, 1.0) * _SCALE).astype(np.uint16)
+    qx, qy = q[:, 0], q[:, 1]
+    points = np.empty((NUM_LANDMARKS, 3), np.uint8)
+    points[:, 0] = qx >> 4
+    points[:, 1] = ((qx & 15) << 4) | (qy >> 8)
+    points[:, 2] = qy & 255
+    return header + mask.tobytes() + points.tobytes()
+
+
+def decode_packet(packet):
+    """
+    bytes -> dict with exercise, reps, stage, posture, progress, index,
+    timestamp, and landmarks: (33, 3) float32 x / y / visible, or None.
+    """
+    (version, flags, stage, progress, exercise, reps, index,
+     timestamp) = _HEADER.unpack_from(packet)
+    if version != VERSION:
+        raise ValueError(f"unsupported landmark packet version {version}")
+
+    landmarks = None
+    if flags & FLAG_POSE:
+        if len(packet) < POSE_SIZE:
+            raise ValueError("truncated landmark packet")
+        mask = np.frombuffer(packet, np.uint8, _MASK_SIZE, HEADER_SIZE)
+        points = np.frombuffer(packet, np.uint8, 3 * NUM_LANDMARKS,
+                               HEADER_SIZE + _MASK_SIZE)
+        points = points.reshape(NUM_LANDMARKS, 3).astype(np.uint16)
+        landmarks = np.empty((NUM_LANDMARKS, 3), np.float32)
+        landmarks[:, 0] = ((points[:, 0] << 4) | (points[:, 1] >> 4)) / _SCALE
+        landmarks[:, 1] = (((points[:, 1] & 15) << 8) | points[:, 2]) / _SCALE
+        landmarks[:, 2] = np.unpackbits(mask, count=NUM_LANDMARKS,
+                                        bitorder="little")
+
+    return {
+        "exercise": EXERCISES[exercise] if exercise < len(EXERCISES) else None,
+        "reps": reps,
+        "stage": STAGES[stage],
+        "posture": bool(flags & FLAG_POSTURE),
+        "progress": progress / 255,
+        "index": index,
+        "timestamp": timestamp / 1000,
+        "landmarks": landmarks,
+    }
@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+
+from engine import EngineStream
+from landmark_packet import encode_packet
+
+LIVE_VIEW_PORT = 8502
+WEBSITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "website")
+# pages served next to the streams (same origin, no CORS)
+PAGES = {"/": "live.html", "/live.html": "live.html",
+         "/skeleton.html": "skeleton.html"}
+
+_BOUNDARY = "frame"
+
+
+class LiveView:
+    """
+    Latest-frame JPEG publisher for remote viewers (tablets etc.).
+
+    publish_frame() only copies the frame into a pending slot and
+    returns; one encoder thread downscales it to max_width, JPEG-encodes
+    it at `quality` and keeps the result, at most max_fps times a
+    second. A frame that is still pending when the next one arrives is
+    dropped (counted in .dropped), so the analysis loop never waits on
+    encoding and a viewer never sees old frames queued up.
+
+    KPIs (reps, stage, posture, ...) are published separately as a tiny
+    JSON message, and landmark packets (see landmark_packet) for
+    clients that draw the skeleton themselves. Viewers wait for the next
+    sequence number of each and always get the newest one: a slow client
+    skips, never lags.
+    """
+
+    def __init__(self, quality=70, max_width=640, max_fps=15.0,
+                 color_order="bgr"):
+        self.quality = quality
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.color_order = color_order
+
+        self._cond = threading.Condition()
+        self._pending = None   # newest unencoded frame
+        self._spare = None     # buffer the encoder just finished with
+        self._has_pending = False
+        self._stopped = False
+        self._thread = None
+
+        self.jpeg = None
+        self.frame_seq = 0
+        self.kpis = None
+        self.kpi_seq = 0
+        self.packet = None
+        self.packet_seq = 0
+        self.dropped = 0
+        self.encoded = 0
+
+    # -------------------------
+    # Producer side (analysis loop)
+    # -------------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._encode_loop,
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def publish_frame(self, frame):
+        """Copies frame (HxWx3 uint8 in color_order); never blocks on encoding."""
+        if frame is None:
+            return
+        with self._cond:
+            buf = self._pending
+            if buf is None or buf.shape != frame.shape:
+                buf = self._pending = np.empty_like(frame)
+            if self._has_pending:
+                self.dropped += 1
+            np.copyto(buf, frame)
+            self._has_pending = True
+            self._cond.notify_all()
+
+    def publish_kpis(self, **kpis):
+        """e.g. publish_kpis(reps=3, stage="up", posture=True, fps=24)"""
+        message = json.dumps(kpis, separators=(",", ":"))
+        with self._cond:
+            if message == self.kpis:
+                return
+            self.kpis = message
+            self.kpi_seq += 1
+            self._cond.notify_all()
+
+    def publish_packet(self, packet):
+        """A landmark_packet for /landmarks; sent as-is, no encoding."""
+        with self._cond:
+            self.packet = packet
+            self.packet_seq += 1
+            self._cond.notify_all()
+
+    # -------------------------
+    # Encoder thread
+    # -------------------------
+    def _encode_loop(self):
+        next_time = 0.0
+        scaled = None
+        converted = None
+        while True:
+            # rate limit first, so the frame taken is the newest one
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopped, delay)
+
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._has_pending or self._stopped)
+                if self._stopped:
+                    return
+                # take the pending buffer, leave the spare for the producer
+                frame = self._pending
+                self._pending = self._spare
+                self._spare = frame
+                self._has_pending = False
+
+            if self.max_fps:
+                next_time = time.monotonic() + 1.0 / self.max_fps
+
+            h, w = frame.shape[:2]
+            if self.max_width and w > self.max_width:
+                size = (self.max_width, round(h * self.max_width / w))
+                if scaled is None or scaled.shape[:2] != (size[1], size[0]):
+                    scaled = None
+                frame = scaled = cv2.resize(frame, size, dst=scaled,
+                                            interpolation=cv2.INTER_AREA)
+            if self.color_order == "rgb":
+                if converted is None or converted.shape != frame.shape:
+                    converted = None
+                frame = converted = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR,
+                                                 dst=converted)
+
+            ok, jpeg = cv2.imencode(".jpg", frame,
+                                    [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+            with self._cond:
+                self.jpeg = jpeg.tobytes()
+                self.frame_seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    # -------------------------
+    # Consumer side (one call per viewer)
+    # -------------------------
+    def next_frame(self, last_seq, timeout=5.0):
+        """(seq, jpeg bytes) newer than last_seq, or (last_seq, None)."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.frame_seq != last_seq or self._stopped, timeout)
+            if self.frame_seq == last_seq:
+                return last_seq, None
+            return self.frame_seq, self.jpeg
+
+    def next_kpis(self, last_seq, timeout=5.0):
+        """(seq, JSON text) newer than last_seq, or (last_seq, None)."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.kpi_seq != last_seq or self._stopped, timeout)
+            if self.kpi_seq == last_seq:
+                return last_seq, None
+            return self.kpi_seq, self.kpis
+
+    def next_packet(self, last_seq, timeout=5.0):
+        """(seq, landmark packet) newer than last_seq, or (last_seq, None)."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.packet_seq != last_seq or self._stopped, timeout)
+            if self.packet_seq == last_seq:
+                return last_seq, None
+            return self.packet_seq, self.packet
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+
+# -------------------------
+# HTTP server
+# -------------------------
+class _Handler(BaseHTTPRequestHandler):
+    # set on the per-server subclass
+    view = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in PAGES:
+            self._page(PAGES[path])
+        elif path == "/stream.mjpg":
+            self._mjpeg()
+        elif path == "/snapshot.jpg":
+            self._snapshot()
+        elif path == "/events":
+            self._events()
+        elif path == "/landmarks":
+            self._landmarks()
+        else:
+            self.send_error(404)
+
+    def _page(self, name):
+        try:
+            with open(os.path.join(WEBSITE_DIR, name), "rb") as f:
+                body = f.read()
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _snapshot(self):
+        jpeg = self.view.jpeg
+        if jpeg is None:
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(jpeg)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+    def _mjpeg(self):
+        self.send_response(200)
+        self.send_header("Content-Type",
+                         f"multipart/x-mixed-replace; boundary={_BOUNDARY}")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        seq = 0
+        try:
+            while not self.view.stopped:
+                seq, jpeg = self.view.next_frame(seq)
+                if jpeg is None:
+                    continue
+                self.wfile.write(
+                    f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _events(self):
+        # Server-Sent Events: one small JSON message per KPI change
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        seq = 0
+        try:
+            while not self.view.stopped:
+                seq, message = self.view.next_kpis(seq)
+                if message is None:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    self.wfile.write(f"data: {message}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+    def _landmarks(self):
+        # binary stream of u16 length-prefixed landmark packets, read in
+        # the browser with fetch() + a stream reader
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        seq = 0
+        try:
+            while not self.view.stopped:
+                seq, packet = self.view.next_packet(seq)
+                if packet is not None:
+                    self.wfile.write(len(packet).to_bytes(2, "little") +
+                                     packet)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve_live_view(view, host="", port=LIVE_VIEW_PORT):
+    """
+    Serves `view` over HTTP on a daemon thread and returns the server
+    (server.shutdown() stops it):
+
+        /               viewer page (website/live.html)
+        /stream.mjpg    MJPEG stream of the encoded frames
+        /snapshot.jpg   the latest frame
+        /events         KPI messages as Server-Sent Events
+        /skeleton.html  client-side skeleton page (website/skeleton.html)
+        /landmarks      landmark packets, u16 length-prefixed
+    """
+    handler = type("LiveViewHandler", (_Handler,), {"view": view})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stream_landmarks(view, exercise_type, video_source, stop_callback=None,
+                     report_label=None, realtime=None):
+    """
+    Runs a session headless and publishes only landmark packets and KPIs
+    to `view`: nothing is drawn or JPEG-encoded on this side, the page
+    (/skeleton.html) draws the skeleton over its own camera / video.
+    Returns the report like start_engine.
+
+    With realtime (default: for video files), packets are published at
+    their media time rather than as fast as analysis runs, so they
+    arrive in step with the page playing the same file; the page itself
+    matches packet timestamps to the video's playback time.
+    """
+    if realtime is None:
+        realtime = (isinstance(video_source, str)
+                    and os.path.isfile(video_source))
+    prev_time = 0
+    start = None
+    with EngineStream(exercise_type, video_source,
+                      report_label=report_label) as stream:
+        for result in stream:
+            if stop_callback and stop_callback() is False:
+                break
+            if realtime:
+                if start is None:
+                    start = time.monotonic() - result.timestamp
+                delay = start + result.timestamp - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            view.publish_packet(encode_packet(result, exercise_type))
+
+            curr_time = time.time()
+            fps = int(1 / (curr_time - prev_time)) if prev_time else 0
+            prev_time = curr_time
+            view.publish_kpis(reps=result.reps, stage=result.stage,
+                              posture=result.posture,
+                              progress=round(result.progress, 2), fps=fps)
+    return stream.result
@@ -0,0 +1,58 @@
+import os
+import time
+
+import cv2
+
+
+class WallClock:
+    """Live sources (webcams, streams): a frame's time is when it was read."""
+
+    def stamp(self, cap):
+        return time.time()
+
+
+class VideoClock:
+    """
+    Recorded files: a frame's time is its presentation timestamp in the
+    video (CAP_PROP_POS_MSEC right after the read), so analysis at any
+    speed sees the same timing as real-time playback. Falls back to
+    frame index / fps where the backend reports no timestamps.
+    """
+
+    def __init__(self, fps=None):
+        self.fps = fps or 30.0
+        self.frames = 0
+        self._last = None
+
+    def stamp(self, cap):
+        index = self.frames
+        self.frames += 1
+
+        t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if (t <= 0.0 and index > 0) or (self._last is not None
+                                         and t < self._last):
+            t = index / self.fps
+        self._last = t
+        return t
+
+
+def source_clock(video_source, cap):
+    """VideoClock for video files, WallClock for everything else."""
+    if isinstance(video_source, str) and os.path.isfile(video_source):
+        return VideoClock(cap.get(cv2.CAP_PROP_FPS))
+    return WallClock()
+
+
+class FrameTime:
+    """
+    The tracker's clock: the timestamp of the frame being processed,
+    set by whoever feeds the frames (engine loop, landmark replay).
+    """
+
+    __slots__ = ("now",)
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,260 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+
+import numpy as np
+import mediapipe as mp
+
+from engine import (
+    _Analyzer, open_capture, frame_reader, render_result, write_report,
+    POSE_CONFIG,
+)
+from media_clock import source_clock
+
+mp_pose = mp.solutions.pose
+
+
+class _Stream:
+    """One source: its capture, Pose graph and tracker state."""
+
+    def __init__(self, index, video_source, exercise_type, label,
+                 queue_size):
+        self.index = index
+        self.source = video_source
+        self.exercise_type = exercise_type
+        self.label = label
+        # live sources drop their oldest frame instead of falling behind;
+        # files wait, so every frame is analyzed
+        self.live = not (isinstance(video_source, str)
+                         and os.path.isfile(video_source))
+
+        self.cap = open_capture(video_source)
+        self.reader = frame_reader(cap=self.cap, count=queue_size + 2,
+                                   clock=source_clock(video_source, self.cap))
+        # MediaPipe tracks across frames, so each stream keeps its own
+        # graph; any worker may run it, but only one at a time
+        self.pose = mp_pose.Pose(**POSE_CONFIG)
+        self.analyzer = _Analyzer(exercise_type, self.pose)
+        self.out = None
+
+        self.pending = deque()
+        self.busy = False
+        self.eof = False
+        self.finished = False
+
+        self.frames = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.prev_time = 0
+
+
+class MultiStreamRunner:
+    """
+    Analyzes several sources at once on a fixed pool of inference
+    workers.
+
+    Every stream has a decode thread and its own _Analyzer (Pose graph,
+    tracker, clock), so rep state never mixes between streams. Decoded
+    frames wait in a per-stream queue of queue_size; the workers pick
+    streams round-robin, one frame at a time, and never run two frames
+    of the same stream at once, so each stream is processed in order and
+    no stream can starve the others. Aggregate inference is bounded by
+    `workers` whatever the number of cameras.
+
+    display_callback(stream_index, frame, counter, stage, posture,
+    progress, fps) runs on a worker thread; frame is None when headless,
+    otherwise a reused BGR buffer (see start_engine).
+    """
+
+    def __init__(self, streams, workers=None, queue_size=2,
+                 display_callback=None, headless=True):
+        self.specs = [self._spec(i, s) for i, s in enumerate(streams)]
+        self.workers = workers or min(multiprocessing.cpu_count(),
+                                      len(self.specs)) or 1
+        self.queue_size = queue_size
+        self.display_callback = display_callback
+        self.headless = headless
+
+        self.streams = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._next = 0
+        self._errors = []
+
+    @staticmethod
+    def _spec(i, stream):
+        # (video_source, exercise_type[, label])
+        source, exercise_type = stream[0], stream[1]
+        label = stream[2] if len(stream) > 2 else f"stream{i}"
+        return source, exercise_type, label
+
+    def run(self, stop_callback=None):
+        """Runs until every stream ends (or stop); returns the results."""
+        self.streams = [_Stream(i, source, exercise, label, self.queue_size)
+                        for i, (source, exercise, label)
+                        in enumerate(self.specs)]
+
+        threads = [threading.Thread(target=self._decode, args=(s,),
+                                    daemon=True) for s in self.streams]
+        threads += [threading.Thread(target=self._work, daemon=True)
+                    for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        try:
+            while any(t.is_alive() for t in threads):
+                if stop_callback and stop_callback() is False:
+                    break
+                self._stop.wait(0.1)
+        finally:
+            self.stop()
+            for t in threads:
+                t.join()
+
+        results = [self._finish(s) for s in self.streams]
+
+        if self._errors:
+            raise self._errors[0]
+        return results
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    # -------------------------
+    # Decode (one thread per stream)
+    # -------------------------
+    def _decode(self, stream):
+        try:
+            while not self._stop.is_set():
+                rgb, timestamp = stream.reader.read()
+                if rgb is None:
+                    break
+                item = (rgb, timestamp, time.perf_counter())
+
+                with self._cond:
+                    if stream.live:
+                        while len(stream.pending) >= self.queue_size:
+                            stale = stream.pending.popleft()
+                            stream.reader.pool.release(stale[0])
+                            stream.dropped += 1
+                    else:
+                        while (len(stream.pending) >= self.queue_size
+                               and not self._stop.is_set()):
+                            self._cond.wait(0.1)
+                    stream.pending.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            with self._cond:
+                stream.eof = True
+                self._cond.notify_all()
+
+    # -------------------------
+    # Inference workers (shared)
+    # -------------------------
+    def _take(self):
+        # next stream with work, round-robin from the last one served
+        n = len(self.streams)
+        for k in range(n):
+            i = (self._next + k) % n
+            s = self.streams[i]
+            if not s.busy and not s.finished and (s.pending or s.eof):
+                self._next = (i + 1) % n
+                return s
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop.is_set():
+                        return
+                    stream = self._take()
+                    if stream is not None:
+                        break
+                    if all(s.finished for s in self.streams):
+                        return
+                    self._cond.wait(0.1)
+
+                stream.busy = True
+                item = stream.pending.popleft() if stream.pending else None
+                self._cond.notify_all()
+
+            try:
+                if item is None:
+                    # end of stream, nothing left queued
+                    ready = stream.analyzer.flush()
+                    stream.finished = True
+                else:
+                    rgb, timestamp, queued = item
+                    ready = stream.analyzer.feed(rgb, timestamp)
+                for rgb, result in ready:
+                    self._emit(stream, rgb, result)
+                if item is not None:
+                    latency = time.perf_counter() - queued
+                    stream.latency_total += latency
+                    stream.latency_max = max(stream.latency_max, latency)
+            except Exception as e:
+                self._errors.append(e)
+                stream.finished = True
+                self.stop()
+            finally:
+                with self._cond:
+                    stream.busy = False
+                    self._cond.notify_all()
+
+    def _emit(self, stream, rgb, result):
+        stream.frames += 1
+
+        frame = None
+        if not self.headless:
+            if stream.out is None:
+                stream.out = np.empty_like(rgb)
+            frame = render_result(rgb, result, stream.exercise_type,
+                                  out=stream.out)
+        stream.reader.pool.release(rgb)
+
+        curr_time = time.time()
+        fps = int(1 / (curr_time - stream.prev_time)) \
+            if stream.prev_time else 0
+        stream.prev_time = curr_time
+
+        if self.display_callback:
+            self.display_callback(stream.index, frame, result.reps,
+                                  result.stage, result.posture,
+                                  result.progress, fps)
+
+    def _finish(self, stream):
+        stream.cap.release()
+        stream.analyzer.close()
+        stream.pose.close()
+
+        a = stream.analyzer
+        result = write_report(stream.exercise_type, a.counter,
+                              int(a.duration), a.good_frames, a.bad_frames,
+                              label=stream.label)
+        result["source"] = stream.source
+        result["frames"] = stream.frames
+        result["dropped"] = stream.dropped
+        inferred = max(1, stream.frames)
+        result["latency_ms"] = 1000.0 * stream.latency_total / inferred
+        result["max_latency_ms"] = 1000.0 * stream.latency_max
+        return result
+
+
+def run_streams(streams, workers=None, display_callback=None,
+                stop_callback=None, headless=True, queue_size=2):
+    """
+    Convenience wrapper: streams is a list of (video_source,
+    exercise_type[, label]). Returns one report dict per stream, in
+    order, with frames / dropped / latency stats added.
+    """
+    runner = MultiStreamRunner(streams, workers, queue_size,
+                               display_callback, headless)
+    return runner.run(stop_callback)
@@ -0,0 +1,140 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from engine import (
+    frame_reader, replay_landmarks, write_report, POSE_CONFIG, FRAME_SIZE,
+)
+from landmark_cache import LandmarkCache, cache_key
+from landmark_frame import LandmarkFrame, NUM_LANDMARKS
+from seek_index import load_index
+
+mp_pose = mp.solutions.pose
+
+# Frames decoded before each shard (and discarded) so MediaPipe's tracker
+# has settled on the athlete by the shard's first real frame
+WARMUP_FRAMES = 30
+
+
+def video_info(video_path):
+    """
+    (frame_count, fps) of a recorded video. Containers without a usable
+    frame count (OpenCV reports 0 or -1 for many webm / mkv files) are
+    counted once through the cached seek index.
+    """
+    cap = cv2.VideoCapture(video_path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    if n_frames <= 0:
+        n_frames = len(load_index(video_path))
+    return n_frames, fps
+
+
+def _infer_shard(video_path, start, stop, warmup):
+    """
+    Worker: (start, landmarks, decoded) with landmarks for frames
+    [start, stop) as a NaN-filled (stop - start, 33, 4) array and decoded
+    the number of those frames actually read (fewer if the video ended
+    or decoding failed early). Runs its own Pose graph.
+    """
+    out = np.full((stop - start, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    first = max(0, start - warmup)
+
+    cap = cv2.VideoCapture(video_path)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    reader = frame_reader(cap, 1)
+    n = 0
+    with mp_pose.Pose(**POSE_CONFIG) as pose:
+        for idx in range(first, stop):
+            rgb, _ = reader.read()
+            if rgb is None:
+                break
+
+            rgb.flags.writeable = False
+            results = pose.process(rgb)
+            rgb.flags.writeable = True
+            reader.pool.release(rgb)
+
+            if idx >= start and results.pose_landmarks:
+                out[idx - start] = \
+                    LandmarkFrame.from_mediapipe(results.pose_landmarks).data
+            n += 1
+
+    cap.release()
+    # full length even when short: later shards keep their frame numbers
+    return start, out, max(0, n - (start - first))
+
+
+def analyze_video_sharded(exercise_type, video_path, workers=None,
+                          shard_frames=None, warmup=WARMUP_FRAMES,
+                          report_label=None, cache=True):
+    """
+    Offline analysis of a recorded video across worker processes.
+
+    The video is split into frame-range shards; each worker runs pose
+    inference on its shard after a short warm-up overlap. Inference is
+    the expensive part, so the per-shard landmark streams are then
+    stitched in frame order and replayed through a single tracker, which
+    gives exactly the rep state a sequential pass over the same
+    landmarks would.
+    """
+    n_frames, fps = video_info(video_path)
+    workers = workers or multiprocessing.cpu_count()
+    if shard_frames is None:
+        shard_frames = max(1, math.ceil(n_frames / workers))
+
+    config = dict(POSE_CONFIG, frame_size=list(FRAME_SIZE))
+    store = key = landmarks = None
+    if cache:
+        # a sequential start_engine run is the best source; otherwise reuse
+        # a previous sharded run with the same shard layout (the landmarks
+        # differ slightly around shard boundaries, so they get their own key)
+        store = LandmarkCache()
+        landmarks = store.get(cache_key(video_path, config))
+        key = cache_key(video_path, dict(config, shard_frames=shard_frames,
+                                         warmup=warmup))
+        if landmarks is None:
+            landmarks = store.get(key)
+
+    if landmarks is None:
+        landmarks = _infer_sharded(video_path, n_frames, workers,
+                                   shard_frames, warmup)
+        if store is not None:
+            store.put(key, landmarks)
+
+    analyzer = replay_landmarks(exercise_type, landmarks, fps)
+
+    duration = int(analyzer.duration)
+    result = write_report(exercise_type, analyzer.counter, duration,
+                          analyzer.good_frames, analyzer.bad_frames,
+                          label=report_label)
+    result["frames"] = len(landmarks)
+    return result
+
+
+def _infer_sharded(video_path, n_frames, workers, shard_frames, warmup):
+    bounds = [(s, min(s + shard_frames, n_frames))
+              for s in range(0, n_frames, shard_frames)]
+
+    # spawn: MediaPipe graphs are not fork-safe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(_infer_shard, video_path, s, e, warmup)
+                   for s, e in bounds]
+        shards = [f.result() for f in futures]
+
+    if not shards:
+        return np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)
+
+    # row i is frame i; only frames past the last one any shard decoded
+    # (an overestimated frame count) are dropped, short middle shards
+    # stay NaN-padded so the frames after them are not shifted
+    end = max(start + decoded for start, _, decoded in shards)
+    return np.concatenate([arr for _, arr, _ in shards])[:end]
@@ -0,0 +1,256 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from angle_kernel import ANGLE_CHANNELS
+
+# Stage codes in RepStateMachine.stage
+NO_STAGE, DOWN, UP = -1, 0, 1
+STAGE_NAMES = {NO_STAGE: None, DOWN: "down", UP: "up"}
+STAGE_CODES = {name: code for code, name in STAGE_NAMES.items()}
+
+RULE_KINDS = ("min", "max", "diff", "present")
+
+
+@dataclass(frozen=True)
+class PostureRule:
+    """
+    One posture condition on smoothed angles; an exercise's posture is
+    good when all its rules hold. channels are one or two angle channels;
+    "min" / "max" / "present" look at their average over the ones that
+    are present (like the rep signal), "diff" at the two separately.
+
+    min      present and >= limit
+    max      missing or <= limit
+    diff     either missing or abs(a - b) <= limit
+    present  at least one channel present
+    """
+    kind: str
+    channels: tuple
+    limit: float = 0.0
+
+
+@dataclass(frozen=True)
+class ExerciseDefinition:
+    """
+    A rep counter as data. The rep signal is the average of channels (one
+    or two smoothed angles, e.g. left/right elbow, over those present).
+
+    The stage becomes "down" once the signal has been past `down` for
+    stable_frames frames, and "up" likewise past `up`; reaching "up"
+    counts a rep if posture has been good for stable_frames frames and
+    the last rep was at least min_rep_interval seconds ago. "Past" means
+    below down / above up, or the reverse with inverted=True (pull-up:
+    the top of the rep is the smaller elbow angle).
+
+    The first measured frame starts in the extended stage (large angle:
+    "up", or "down" when inverted) if the signal is past its threshold,
+    otherwise in the other one. Progress is the signal's position from
+    down (0.0) to up (1.0).
+    """
+    name: str
+    channels: tuple
+    down: float
+    up: float
+    inverted: bool = False
+    posture: tuple = ()
+    stable_frames: int = 3
+    min_rep_interval: float = 0.6  # seconds
+
+    @property
+    def required_channels(self):
+        """Channels read by the signal and posture rules, in ANGLE_CHANNELS order."""
+        used = set(self.channels)
+        for rule in self.posture:
+            used.update(rule.channels)
+        return tuple(name for name in ANGLE_CHANNELS if name in used)
+
+    @classmethod
+    def from_dict(cls, d):
+        """From plain data, e.g. a JSON exercise config."""
+        d = dict(d)
+        d["channels"] = tuple(d["channels"])
+        d["posture"] = tuple(
+            PostureRule(r["kind"], tuple(r["channels"]), r.get("limit", 0.0))
+            for r in d.get("posture", ()))
+        return cls(**d)
+
+
+def _channel_pair(channels):
+    # a single channel repeats itself, so (a + a) / 2 == a exactly and
+    # every signal goes through the same gather
+    if not 1 <= len(channels) <= 2:
+        raise ValueError(f"expected one or two channels: {channels}")
+    for name in channels:
+        if name not in ANGLE_CHANNELS:
+            raise ValueError(f"unknown angle channel: {name}")
+    idx = [ANGLE_CHANNELS.index(name) for name in channels]
+    return idx * 2 if len(idx) == 1 else idx
+
+
+def _pair_average(a, b):
+    # average of the present values, NaN when both are missing
+    return np.where(np.isnan(a), b, np.where(np.isnan(b), a, (a + b) / 2.0))
+
+
+class RepStateMachine:
+    """
+    Evaluates many ExerciseDefinitions on the same smoothed-angle stream,
+    one vectorized step per frame. Per-definition state (stage, counter,
+    stability counters, last rep time) lives in arrays indexed like
+    `definitions`.
+    """
+
+    def __init__(self, definitions):
+        self.definitions = tuple(definitions)
+        self.names = [d.name for d in self.definitions]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        defs = self.definitions
+        n = len(defs)
+
+        self._signal = np.array([_channel_pair(d.channels) for d in defs],
+                                dtype=np.intp).reshape(n, 2)
+        self._sign = np.array([-1.0 if d.inverted else 1.0 for d in defs])
+        self._down = np.array([d.down for d in defs], dtype=np.float64)
+        self._up = np.array([d.up for d in defs], dtype=np.float64)
+        inverted = np.array([d.inverted for d in defs], dtype=bool)
+        self._extended = np.where(inverted, DOWN, UP)
+        self._extended_at = np.where(inverted, self._down, self._up)
+        self._stable_required = np.array([d.stable_frames for d in defs])
+        self._min_interval = np.array([d.min_rep_interval for d in defs],
+                                      dtype=np.float64)
+
+        rules = [(i, r) for i, d in enumerate(defs) for r in d.posture]
+        for _, r in rules:
+            if r.kind not in RULE_KINDS:
+                raise ValueError(f"unknown posture rule: {r.kind}")
+        self._rule_def = np.array([i for i, _ in rules], dtype=np.intp)
+        self._rule_idx = np.array([_channel_pair(r.channels)
+                                   for _, r in rules],
+                                  dtype=np.intp).reshape(len(rules), 2)
+        self._rule_kind = np.array([RULE_KINDS.index(r.kind)
+                                    for _, r in rules], dtype=np.intp)
+        self._rule_limit = np.array([r.limit for _, r in rules],
+                                    dtype=np.float64)
+
+        self.reset()
+
+    def reset(self):
+        n = len(self.definitions)
+        self.stage = np.full(n, NO_STAGE, dtype=np.int8)
+        self.counter = np.zeros(n, dtype=np.int64)
+        self.stable = np.zeros(n, dtype=np.int64)
+        self.posture_stable = np.zeros(n, dtype=np.int64)
+        self.last_rep_time = np.full(n, -np.inf)
+        self.posture = np.zeros(n, dtype=bool)
+        self.progress = np.zeros(n)
+
+    def posture_ok(self, values):
+        """(definitions,) bool: every posture rule holds on values."""
+        bad = np.zeros(len(self.definitions), dtype=bool)
+        if not len(self._rule_def):
+            return ~bad
+
+        a = values[self._rule_idx[:, 0]]
+        b = values[self._rule_idx[:, 1]]
+        signal = _pair_average(a, b)
+        limit = self._rule_limit
+        with np.errstate(invalid="ignore"):
+            ok = np.choose(self._rule_kind, [
+                signal >= limit,          # NaN compares False: missing fails
+                ~(signal > limit),        # ... and passes here
+                ~(np.abs(a - b) > limit),
+                ~np.isnan(signal),
+            ])
+        bad[self._rule_def[~ok]] = True
+        return ~bad
+
+    def step(self, values, now, active=None, count=True):
+        """
+        One frame. values: smoothed angles ordered as ANGLE_CHANNELS
+        (NaN = missing); now: the frame's time in seconds; active: bool
+        mask of definitions to step (default all). Definitions whose
+        signal is missing keep their state and report bad posture and
+        zero progress. Results are left in counter / stage / posture /
+        progress. With count=False stages still change but no rep is
+        counted and the minimum rep interval is not restarted (warm-up).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        signal = _pair_average(values[self._signal[:, 0]],
+                               values[self._signal[:, 1]])
+        run = ~np.isnan(signal)
+        if active is not None:
+            run &= active
+
+        s = self._sign
+        start = run & (self.stage == NO_STAGE)
+        self.stage[start] = np.where(
+            signal[start] > self._extended_at[start],
+            self._extended[start], 1 - self._extended[start])
+
+        posture = self.posture_ok(values)
+        going_up = self.stage == DOWN
+        moving = run & np.where(going_up, s * signal > s * self._up,
+                                s * signal < s * self._down)
+
+        self.stable[run & ~moving] = 0
+        self.stable[moving] += 1
+        flip = moving & (self.stable >= self._stable_required)
+
+        # a rep is the confirmed return to "up", with settled good posture
+        arrived = flip & going_up
+        rep = (arrived & posture &
+               (self.posture_stable >= self._stable_required) &
+               (now - self.last_rep_time >= self._min_interval))
+        if not count:
+            rep[:] = False
+        self.counter[rep] += 1
+        self.last_rep_time[rep] = now
+
+        self.stage[flip] = 1 - self.stage[flip]
+        self.stable[flip] = 0
+        self.posture_stable[arrived] = 0
+
+        good = run & posture
+        self.posture_stable[good] = np.minimum(
+            self.posture_stable[good] + 1, self._stable_required[good])
+        self.posture_stable[run & ~posture] = 0
+
+        progress = np.clip((signal - self._down) / (self._up - self._down),
+                           0.0, 1.0)
+        if active is None:
+            self.posture = good
+            self.progress = np.where(run, progress, 0.0)
+        else:
+            self.posture[active] = good[active]
+            self.progress[active] = np.where(run, progress, 0.0)[active]
+
+    def threshold_distance(self, values):
+        """
+        (definitions,) degrees from the rep signal to the threshold the
+        current stage moves toward next (up from "down", down from "up");
+        NaN before the first stage or while the signal is missing.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        signal = _pair_average(values[self._signal[:, 0]],
+                               values[self._signal[:, 1]])
+        target = np.where(self.stage == DOWN, self._up, self._down)
+        return np.where(self.stage == NO_STAGE, np.nan,
+                        np.abs(signal - target))
+
+    def result(self, i):
+        """[counter, stage, posture_bool, progress] of definition i."""
+        return [int(self.counter[i]), STAGE_NAMES[int(self.stage[i])],
+                bool(self.posture[i]), float(self.progress[i])]
+
+    def run(self, values, times):
+        """
+        Offline pass over an (N, channels) smoothed-angle stack:
+        returns (N, definitions) rep counts after every frame.
+        """
+        counts = np.empty((len(values), len(self.definitions)),
+                          dtype=np.int64)
+        for i, (v, t) in enumerate(zip(values, times)):
+            self.step(v, t)
+            counts[i] = self.counter
+        return counts
@@ -0,0 +1,116 @@
+import numpy as np
+
+from landmark_frame import LandmarkFrame, X, Y, Z, VISIBILITY
+
+
+class RoiTracker:
+    """
+    Region of interest for the next inference, from the previous frame's
+    landmark bounding box plus padding.
+
+    MediaPipe's tracking state is relative to the image it was given, so
+    the box must stay put between re-boxes (callers start a fresh Pose
+    graph whenever it moves). It only moves when the athlete comes within
+    edge of its border, or has stayed regrow times larger than needed for
+    shrink_after frames in a row. A short loss of tracking (up to
+    max_lost frames) keeps the box, so a flickering detection does not
+    force a new graph each time.
+
+    Not a speed-up with MediaPipe Pose: its landmark model already runs
+    on a fixed-size crop around the tracked person, so a smaller input
+    saves little, and each re-box restarts the graph in detection mode.
+    On the bundled clips ROI mode was 5-35% slower than full frame (also
+    with one graph kept across re-boxes). It can still help when the
+    athlete is small in a large frame.
+    """
+
+    def __init__(self, padding=0.5, min_visibility=0.5, edge=0.05,
+                 regrow=3.0, shrink_after=30, max_lost=15):
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.edge = edge
+        self.regrow = regrow
+        self.shrink_after = shrink_after
+        self.max_lost = max_lost
+        self.oversize = 0
+        self.box = None  # (x0, y0, x1, y1) in pixels, None = full frame
+        self.lost = 0
+
+    def crop(self, rgb):
+        """Returns (image to run inference on, box used or None)."""
+        if self.box is None:
+            return rgb, None
+        x0, y0, x1, y1 = self.box
+        return np.ascontiguousarray(rgb[y0:y1, x0:x1]), self.box
+
+    def reset(self):
+        self.box = None
+        self.lost = 0
+        self.oversize = 0
+
+    def update(self, landmarks, frame_w, frame_h):
+        """landmarks: full-frame LandmarkFrame of this frame, or None."""
+        if landmarks is None:
+            self.lost += 1
+            if self.lost > self.max_lost:
+                self.reset()
+            return
+        self.lost = 0
+
+        data = landmarks.data
+        visible = data[data[:, VISIBILITY] >= self.min_visibility]
+        if len(visible) < 2:
+            self.box = None
+            return
+
+        xs = visible[:, X] * frame_w
+        ys = visible[:, Y] * frame_h
+        bx0, bx1 = xs.min(), xs.max()
+        by0, by1 = ys.min(), ys.max()
+
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            margin_x = (x1 - x0) * self.edge
+            margin_y = (y1 - y0) * self.edge
+            # sides clamped to the frame border cannot grow anyway
+            inside = ((x0 == 0 or bx0 >= x0 + margin_x) and
+                      (x1 == frame_w or bx1 <= x1 - margin_x) and
+                      (y0 == 0 or by0 >= y0 + margin_y) and
+                      (y1 == frame_h or by1 <= y1 - margin_y))
+            needed = (bx1 - bx0) * (by1 - by0) * (1 + 2 * self.padding) ** 2
+            if (x1 - x0) * (y1 - y0) > needed * self.regrow:
+                self.oversize += 1
+            else:
+                self.oversize = 0
+            if inside and self.oversize < self.shrink_after:
+                return
+
+        pad_x = (bx1 - bx0) * self.padding
+        pad_y = (by1 - by0) * self.padding
+        x0 = int(max(0, bx0 - pad_x))
+        y0 = int(max(0, by0 - pad_y))
+        x1 = int(min(frame_w, bx1 + pad_x + 1))
+        y1 = int(min(frame_h, by1 + pad_y + 1))
+
+        self.oversize = 0
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            self.box = None
+        elif x0 == 0 and y0 == 0 and x1 == frame_w and y1 == frame_h:
+            self.box = None
+        else:
+            self.box = (x0, y0, x1, y1)
+
+
+def to_full_frame(landmarks, box, frame_w, frame_h):
+    """Maps crop-normalized landmarks back to full-frame normalized ones."""
+    if box is None:
+        return landmarks
+
+    x0, y0, x1, y1 = box
+    cw, ch = x1 - x0, y1 - y0
+    data = landmarks.data.copy()
+    data[:, X] = (data[:, X] * cw + x0) / frame_w
+    data[:, Y] = (data[:, Y] * ch + y0) / frame_h
+    # z shares x's scale in MediaPipe's normalized output
+    data[:, Z] = data[:, Z] * cw / frame_w
+    return LandmarkFrame(data)
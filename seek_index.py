@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import subprocess
+
+import cv2
+import numpy as np
+
+from landmark_cache import file_digest
+
+INDEX_DIR = "seek_index"
+
+
+class SeekIndex:
+    """
+    Presentation time of every frame of a video (seconds from the first
+    frame, as CAP_PROP_POS_MSEC reports it) and, where the container was
+    probed with ffprobe, which frames are keyframes.
+
+    Times map to exact frame numbers through the recorded timestamps,
+    and a seek to a keyframe needs no decoding to reach, so segment
+    processing starts decoding there. Seeks themselves go through
+    OpenCV, which converts frame numbers (and CAP_PROP_POS_MSEC) at the
+    nominal frame rate: exact for constant frame rate video, off by
+    the drift from that rate for variable frame rate video.
+    """
+
+    def __init__(self, timestamps, keyframes=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.keyframes = None
+        if keyframes is not None and len(keyframes):
+            self.keyframes = np.asarray(keyframes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def fps(self):
+        """Average frame rate (30 when it cannot be told)."""
+        if len(self) < 2 or self.timestamps[-1] <= 0:
+            return 30.0
+        return (len(self) - 1) / self.timestamps[-1]
+
+    def frame_at(self, t):
+        """First frame shown at or after t seconds."""
+        # half a millisecond of slack for rounded user input
+        return int(np.searchsorted(self.timestamps, t - 0.0005, "left"))
+
+    def frame_range(self, start=None, end=None):
+        """[first, stop) frames of the time range; None = video start/end."""
+        first = 0 if start is None else self.frame_at(start)
+        stop = len(self) if end is None else self.frame_at(end)
+        return first, max(first, stop)
+
+    def seek_point(self, frame):
+        """Nearest keyframe at or before frame (frame itself if unknown)."""
+        if self.keyframes is None:
+            return frame
+        i = np.searchsorted(self.keyframes, frame, "right") - 1
+        return int(self.keyframes[i]) if i >= 0 else 0
+
+    def save(self, path):
+        # unique temp name: parallel workers may index the same video
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".",
+                                         suffix=".tmp", delete=False) as f:
+            np.savez(f, timestamps=self.timestamps,
+                     keyframes=self.keyframes if self.keyframes is not None
+                     else np.empty(0, np.int64))
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["timestamps"], data["keyframes"])
+
+
+def build_index(video_path):
+    """
+    SeekIndex from ffprobe's packet list (demux only, with keyframes)
+    when ffprobe is installed, else from one cv2 grab() pass.
+    """
+    if shutil.which("ffprobe"):
+        index = _probe_index(video_path)
+        if index is not None:
+            return index
+
+    cap = cv2.VideoCapture(video_path)
+    timestamps = []
+    while cap.grab():
+        timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    cap.release()
+    return SeekIndex(timestamps)
+
+
+def _probe_index(video_path):
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0",
+           video_path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True,
+                             check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    pts, keys = [], []
+    for line in out.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or fields[0] in ("", "N/A"):
+            continue
+        pts.append(float(fields[0]))
+        keys.append("K" in fields[1])
+    if not pts:
+        return None
+
+    # packets come in decode order; frames are shown in pts order
+    order = np.argsort(pts, kind="stable")
+    pts = np.asarray(pts)[order]
+    keyframes = np.flatnonzero(np.asarray(keys)[order])
+    return SeekIndex(pts - pts[0], keyframes)
+
+
+def load_index(video_path, index_dir=INDEX_DIR):
+    """The video's SeekIndex, built once and cached by file content."""
+    os.makedirs(index_dir, exist_ok=True)
+    path = os.path.join(index_dir, file_digest(video_path) + ".npz")
+    try:
+        return SeekIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        pass
+    index = build_index(video_path)
+    index.save(path)
+    return index
+
+
+def plan_segments(index, segments, warmup_frames):
+    """
+    [(warm_first, first, stop)] frame ranges for [(start_s, end_s), ...]
+    (None = video start / end): sorted, overlaps merged, empty ranges
+    dropped. Frames [warm_first, first) only warm the trackers up.
+    """
+    ranges = sorted(index.frame_range(start, end) for start, end in segments)
+    merged = []
+    for first, stop in ranges:
+        if first >= stop:
+            continue
+        if merged and first <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([first, stop])
+
+    plan = []
+    prev_stop = 0
+    for first, stop in merged:
+        # never warm up on frames an earlier segment already analyzed
+        warm_first = max(first - warmup_frames, prev_stop if plan else 0)
+        plan.append((warm_first, first, stop))
+        prev_stop = stop
+    return plan
@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+
+FILTERS = ("mean", "ema", "one_euro")
+
+# Used for the One Euro filter when the caller gives no timestamps
+DEFAULT_DT = 1 / 30
+
+
+class AngleSmoother:
+    """
+    Constant-time smoothing of all angle channels at once.
+
+    Samples live in one (window, channels) ring buffer with a running sum
+    per channel, so a moving-average update costs the same for any
+    window. NaN means "not measured this frame": that channel keeps its
+    previous window (and filter state) untouched, and a channel with no
+    samples yet reads as NaN.
+
+    Each channel can instead use an EMA (alpha) or a One Euro filter
+    (min_cutoff, beta, d_cutoff; adaptive cutoff, so jitter at rest is
+    cut hard while fast movement stays responsive).
+    """
+
+    def __init__(self, channels, window=5, filters=None, alpha=0.3,
+                 min_cutoff=1.0, beta=0.007, d_cutoff=1.0):
+        self.channels = tuple(channels)
+        n = len(self.channels)
+        self.window = window
+
+        filters = filters or {}
+        for name, kind in filters.items():
+            if name not in self.channels:
+                raise ValueError(f"unknown channel: {name}")
+            if kind not in FILTERS:
+                raise ValueError(f"unknown filter: {kind}")
+        kinds = [filters.get(name, "mean") for name in self.channels]
+        self._mean = np.array([k == "mean" for k in kinds])
+        self._ema = np.array([k == "ema" for k in kinds])
+        self._euro = np.array([k == "one_euro" for k in kinds])
+        self._all_mean = bool(self._mean.all())
+
+        self.alpha = alpha
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+        self._ring = np.zeros((window, n))
+        self._head = np.zeros(n, dtype=np.intp)   # next slot per channel
+        self._count = np.zeros(n, dtype=np.intp)  # samples in the window
+        self._sum = np.zeros(n)
+        self._cols = np.arange(n)
+        # While no channel has missed a sample, all heads/counts are equal
+        # and tracked as the scalars below (whole-row updates, no masks)
+        self._aligned = True
+        self._slot = 0
+        self._filled = 0
+
+        self._state = np.full(n, np.nan)  # EMA / One Euro output
+        self._dx = np.zeros(n)            # One Euro derivative estimate
+        self._last_t = None
+
+        self.value = np.full(n, np.nan)
+
+    def update(self, values, timestamp=None):
+        """values: (channels,) array, NaN = missing. Returns self.value."""
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+
+        dt = DEFAULT_DT
+        if timestamp is not None:
+            if self._last_t is not None and timestamp > self._last_t:
+                dt = timestamp - self._last_t
+            self._last_t = timestamp
+
+        if self._aligned and present.all():
+            self._update_mean_rows(values)
+        else:
+            if self._aligned:
+                self._aligned = False
+                self._head[:] = self._slot
+                self._count[:] = self._filled
+            m = present & self._mean
+            if m.any():
+                self._update_mean(values, m)
+
+        if self._all_mean:
+            return self.value
+        m = present & self._ema
+        if m.any():
+            self._update_ema(values, m)
+        m = present & self._euro
+        if m.any():
+            self._update_euro(values, m, dt)
+        return self.value
+
+    def as_dict(self):
+        """{channel: float or None}"""
+        return {name: (None if math.isnan(v) else v)
+                for name, v in zip(self.channels, self.value.tolist())}
+
+    def _update_mean_rows(self, values):
+        slot = self._slot
+        if self._filled == self.window:
+            self._sum -= self._ring[slot]
+        else:
+            self._filled += 1
+        self._ring[slot] = values
+        self._sum += values
+        self._slot = slot = (slot + 1) % self.window
+
+        if slot == 0:
+            # re-add from scratch once per lap so rounding cannot drift
+            self._sum = self._ring.sum(axis=0)
+
+        if self._all_mean:
+            np.divide(self._sum, self._filled, out=self.value)
+        else:
+            self.value[self._mean] = self._sum[self._mean] / self._filled
+
+    def _update_mean(self, values, m):
+        cols = self._cols[m]
+        slots = self._head[m]
+        full = self._count[m] == self.window
+
+        self._sum[cols] -= np.where(full, self._ring[slots, cols], 0.0)
+        self._ring[slots, cols] = values[m]
+        self._sum[cols] += values[m]
+        self._count[cols] += ~full
+        self._head[cols] = (slots + 1) % self.window
+
+        # re-add from scratch once per lap so rounding cannot drift
+        wrapped = cols[self._head[cols] == 0]
+        if len(wrapped):
+            self._sum[wrapped] = self._ring[:, wrapped].sum(axis=0)
+
+        self.value[cols] = self._sum[cols] / self._count[cols]
+
+    def _update_ema(self, values, m):
+        state = self._state[m]
+        x = values[m]
+        self._state[m] = np.where(np.isnan(state), x,
+                                  state + self.alpha * (x - state))
+        self.value[m] = self._state[m]
+
+    def _update_euro(self, values, m, dt):
+        prev = self._state[m]
+        x = values[m]
+        first = np.isnan(prev)
+
+        dx = np.where(first, 0.0, (x - prev) / dt)
+        dx_hat = self._dx[m] + _alpha(self.d_cutoff, dt) * (dx - self._dx[m])
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        state = np.where(first, x, prev + _alpha(cutoff, dt) * (x - prev))
+
+        self._dx[m] = dx_hat
+        self._state[m] = state
+        self.value[m] = state
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
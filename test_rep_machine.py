@@ -0,0 +1,182 @@
+import unittest
+
+import numpy as np
+
+from angle_kernel import ANGLE_CHANNELS
+from rep_machine import RepStateMachine, STAGE_NAMES
+from types_of_exercise import EXERCISE_DEFINITIONS
+
+STABLE_FRAMES_REQUIRED = 3
+MIN_REP_INTERVAL = 0.6
+
+
+# -------------------------
+# Reference: the if/else tracker the transition table replaced
+# -------------------------
+def _posture_push(a):
+    if a["abdomen"] is None or a["abdomen"] < 150:
+        return False
+    le, re = a["left_elbow"], a["right_elbow"]
+    return not (le is not None and re is not None and abs(le - re) > 30)
+
+
+def _posture_pull(a):
+    if a["abdomen"] is None or (a["left_elbow"] is None
+                                and a["right_elbow"] is None):
+        return False
+    return a["abdomen"] >= 100
+
+
+def _posture_squat(a):
+    avg = _average(a["left_knee"], a["right_knee"])
+    return avg is not None and avg >= 90
+
+
+def _posture_sit(a):
+    if a["abdomen"] is None or a["abdomen"] < 100:
+        return False
+    return not (a["neck"] is not None and a["neck"] > 40)
+
+
+def _average(a, b):
+    if a is None:
+        return b
+    return a if b is None else (a + b) / 2.0
+
+
+class LegacyTracker:
+    """
+    Per-exercise branches as in the old TypeOfExercise: push-up, squat
+    and sit-up count on the way back "up" (angle above UP), pull-up on
+    reaching the top (elbow angle below UP).
+    """
+
+    # name: (signal channels, DOWN, UP, inverted, posture check)
+    EXERCISES = {
+        "push-up": (("left_elbow", "right_elbow"), 70.0, 160.0, False,
+                    _posture_push),
+        "pull-up": (("left_elbow", "right_elbow"), 150.0, 80.0, True,
+                    _posture_pull),
+        "squat": (("left_knee", "right_knee"), 70.0, 160.0, False,
+                  _posture_squat),
+        "sit-up": (("abdomen", "abdomen"), 70.0, 120.0, False,
+                   _posture_sit),
+    }
+
+    def __init__(self):
+        self.stable = dict.fromkeys(self.EXERCISES, 0)
+        self.posture_stable = dict.fromkeys(self.EXERCISES, 0)
+        self.last_rep_time = dict.fromkeys(self.EXERCISES, float("-inf"))
+
+    def step(self, name, angles, now, counter, stage):
+        channels, down, up, inverted, posture_ok = self.EXERCISES[name]
+        avg = _average(angles[channels[0]], angles[channels[1]])
+        if avg is None:
+            return [counter, stage, False, 0.0]
+
+        if inverted:
+            past_up, past_down = avg < up, avg > down
+            if stage is None:
+                stage = "down" if avg > down else "up"
+        else:
+            past_up, past_down = avg > up, avg < down
+            if stage is None:
+                stage = "up" if avg > up else "down"
+
+        if stage == "down":
+            if past_up:
+                self.stable[name] += 1
+                if self.stable[name] >= STABLE_FRAMES_REQUIRED:
+                    if (posture_ok(angles) and self.posture_stable[name]
+                            >= STABLE_FRAMES_REQUIRED
+                            and now - self.last_rep_time[name]
+                            >= MIN_REP_INTERVAL):
+                        self.last_rep_time[name] = now
+                        counter += 1
+                    stage = "up"
+                    self.stable[name] = 0
+                    self.posture_stable[name] = 0
+            else:
+                self.stable[name] = 0
+        else:
+            if past_down:
+                self.stable[name] += 1
+                if self.stable[name] >= STABLE_FRAMES_REQUIRED:
+                    stage = "down"
+                    self.stable[name] = 0
+            else:
+                self.stable[name] = 0
+
+        if posture_ok(angles):
+            self.posture_stable[name] = min(self.posture_stable[name] + 1,
+                                            STABLE_FRAMES_REQUIRED)
+            posture = True
+        else:
+            self.posture_stable[name] = 0
+            posture = False
+
+        lo, hi = (up, down) if inverted else (down, up)
+        progress = min(max((avg - lo) / (hi - lo), 0.0), 1.0)
+        if inverted:
+            progress = 1.0 - progress
+        return [counter, stage, posture, progress]
+
+
+def random_stream(rng, frames):
+    """(frames, channels) angles swinging through every threshold, with
+    dropouts (NaN), and frame times with jitter."""
+    t = np.cumsum(rng.uniform(0.01, 0.12, frames))
+    values = np.empty((frames, len(ANGLE_CHANNELS)))
+    for c in range(len(ANGLE_CHANNELS)):
+        period = rng.uniform(0.5, 4.0)
+        center, swing = rng.uniform(60, 140), rng.uniform(20, 90)
+        values[:, c] = (center + swing * np.sin(2 * np.pi * t / period
+                                                + rng.uniform(0, 6))
+                        + rng.normal(0, 8, frames))
+    values = np.clip(values, 0.0, 180.0)
+    values[rng.random(values.shape) < rng.uniform(0.0, 0.2)] = np.nan
+    return values, t
+
+
+class RepMachineMatchesLegacyTest(unittest.TestCase):
+    def test_random_streams(self):
+        rng = np.random.default_rng(16)
+        names = list(EXERCISE_DEFINITIONS)
+        for stream in range(300):
+            values, times = random_stream(rng, 200)
+            machine = RepStateMachine(EXERCISE_DEFINITIONS.values())
+            legacy = LegacyTracker()
+            state = {name: (0, None) for name in names}
+
+            for frame, (v, now) in enumerate(zip(values, times)):
+                machine.step(v, now)
+                angles = {ch: None if np.isnan(x) else float(x)
+                          for ch, x in zip(ANGLE_CHANNELS, v)}
+                for i, name in enumerate(names):
+                    counter, stage, posture, progress = legacy.step(
+                        name, angles, now, *state[name])
+                    state[name] = (counter, stage)
+                    where = f"stream {stream} frame {frame} {name}"
+                    self.assertEqual(int(machine.counter[i]), counter, where)
+                    self.assertEqual(STAGE_NAMES[int(machine.stage[i])],
+                                     stage, where)
+                    self.assertEqual(bool(machine.posture[i]), posture,
+                                     where)
+                    self.assertAlmostEqual(float(machine.progress[i]),
+                                           progress, 9, where)
+
+    def test_streams_count_reps(self):
+        # the comparison above must exercise counting, not just agree on 0
+        rng = np.random.default_rng(16)
+        machine = RepStateMachine(EXERCISE_DEFINITIONS.values())
+        total = np.zeros(len(EXERCISE_DEFINITIONS), dtype=np.int64)
+        for _ in range(50):
+            values, times = random_stream(rng, 200)
+            machine.reset()
+            machine.run(values, times)
+            total += machine.counter
+        self.assertTrue((total > 0).all(), total)
+
+
+if __name__ == "__main__":
+    unittest.main()
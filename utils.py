@@ -4,6 +4,8 @@ import pandas as pd
 import numpy as np
 import cv2
 
+from landmark_frame import LandmarkFrame, NUM_LANDMARKS, JOINT_NAMES, X, Y
+
 mp_pose = mp.solutions.pose
 
 def calculate_angle(a, b, c):
@@ -23,6 +25,8 @@ def calculate_angle(a, b, c):
 
 
 def detection_body_part(landmarks, body_part_name):
+    if isinstance(landmarks, LandmarkFrame):
+        return landmarks.part(body_part_name)
     return [
         landmarks[mp_pose.PoseLandmark[body_part_name].value].x,
         landmarks[mp_pose.PoseLandmark[body_part_name].value].y,
@@ -31,23 +35,64 @@ def detection_body_part(landmarks, body_part_name):
 
 
 def detection_body_parts(landmarks):
-    body_parts = pd.DataFrame(columns=["body_part", "x", "y"])
+    # columnar build: one allocation instead of 33 row assignments
+    frame = LandmarkFrame.from_mediapipe(landmarks)
+    return pd.DataFrame({
+        "body_part": JOINT_NAMES,
+        "x": frame.data[:, X].astype(np.float64),
+        "y": frame.data[:, Y].astype(np.float64),
+    })
+
+
+def stack_landmark_frames(frames):
+    """
+    (N, 33, 4) float32 array from a sequence of LandmarkFrame /
+    MediaPipe landmarks. Frames without a pose (None) are NaN-filled.
+    """
+    if isinstance(frames, np.ndarray):
+        return frames.reshape(-1, NUM_LANDMARKS, 4)
+
+    out = np.full((len(frames), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    for i, f in enumerate(frames):
+        if f is not None:
+            out[i] = LandmarkFrame.from_mediapipe(f).data
+    return out
+
+
+def detection_body_parts_session(frames, frame_indices=None):
+    """
+    Long-format landmark table for a whole session:
+    one row per (frame, joint) with x, y, z, visibility.
+    Frames where no pose was detected are left out.
+    """
+    data = stack_landmark_frames(frames)
+    if frame_indices is None:
+        frame_indices = np.arange(len(data))
+    frame_indices = np.asarray(frame_indices)
 
-    for i, lndmrk in enumerate(mp_pose.PoseLandmark):
-        lndmrk = str(lndmrk).split(".")[1]
-        cord = detection_body_part(landmarks, lndmrk)
-        body_parts.loc[i] = lndmrk, cord[0], cord[1]
+    valid = ~np.isnan(data[:, 0, 0])
+    rows = data[valid].reshape(-1, 4)
+    n_valid = int(valid.sum())
 
-    return body_parts
+    return pd.DataFrame({
+        "frame": np.repeat(frame_indices[valid], NUM_LANDMARKS),
+        "joint": pd.Categorical.from_codes(
+            np.tile(np.arange(NUM_LANDMARKS), n_valid),
+            categories=JOINT_NAMES),
+        "x": rows[:, 0],
+        "y": rows[:, 1],
+        "z": rows[:, 2],
+        "visibility": rows[:, 3],
+    })
 
 
-def score_table(exercise, frame , counter, status):
+def score_table(exercise, frame , counter, status, color=(0, 0, 255)):
     cv2.putText(frame, "Activity : " + exercise.replace("-", " "),
-                (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2,
+                (10, 65), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2,
                 cv2.LINE_AA)
     cv2.putText(frame, "Counter : " + str(counter), (10, 100),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2, cv2.LINE_AA)
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2, cv2.LINE_AA)
     cv2.putText(frame, "Status : " + str(status), (10, 135),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2, cv2.LINE_AA)
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2, cv2.LINE_AA)
     return frame
     